@@ -0,0 +1 @@
+# Lets pytest import the game and utils packages from the repository root.
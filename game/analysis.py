@@ -0,0 +1,147 @@
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+from collections import deque
+from game.position import Position
+from game.engine import Engine, MATE_SCORE
+from game.movegen import legal_moves, in_check
+from game.move import move_to_uci
+from game.notation import move_to_san
+
+_engine: Engine = None
+
+def read_positions(lines):
+    # Yields (fen, operations) per FEN or EPD line without reading ahead;
+    # EPD operations such as id are passed through to the output.
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        fields = line.split()
+        operations = " ".join(fields[4:])
+        if len(fields) >= 6 and fields[4].isdigit() and fields[5].isdigit():
+            fen = " ".join(fields[:6])
+            operations = " ".join(fields[6:])
+        else:
+            fen = " ".join(fields[:4]) + " 0 1"
+        yield fen, operations
+
+def _init_worker(hash_size_mb):
+    global _engine
+    _engine = Engine(Position(), None, hash_size_mb=hash_size_mb)
+
+def analyse(fen, depth=None, nodes=None, time_limit=None):
+    # Any failure becomes an error record for this position alone, so one bad
+    # line cannot abort the batch and lose everyone else's results.
+    try:
+        return _analyse(fen, depth, nodes, time_limit)
+    except Exception as error:
+        return {"fen": fen, "error": f"{type(error).__name__}: {error}"}
+
+def _analyse(fen, depth, nodes, time_limit):
+    # Every position starts from a cold table so results do not depend on
+    # which positions the worker happened to search before.
+    if _engine is None:
+        _init_worker(16)
+    try:
+        position = Position.from_fen(fen)
+    except ValueError as error:
+        return {"fen": fen, "error": str(error)}
+    if not legal_moves(position):
+        # Nothing to search: the record carries the result instead of a move.
+        checkmate = in_check(position)
+        return {"fen": fen, "terminal": "checkmate" if checkmate else "stalemate",
+                "score": -MATE_SCORE if checkmate else 0, "depth": 0, "nodes": 0, "elapsed": 0.0}
+    _engine.position = position
+    _engine.ai_color = position.turn
+    _engine.transposition_table.clear()
+    result = _engine.search(depth, nodes, time_limit)
+    san_pv = []
+    for move in result.pv:
+        san_pv.append(move_to_san(position, move))
+        position.make_move(move)
+    for _ in result.pv:
+        position.unmake_move()
+    return {
+        "fen": fen,
+        "best_move": move_to_uci(result.best_move),
+        "san": move_to_san(position, result.best_move) if result.best_move else None,
+        "pv": " ".join(move_to_uci(move) for move in result.pv),
+        "san_pv": " ".join(san_pv),
+        "score": result.score,
+        "depth": result.depth,
+        "nodes": result.nodes,
+        "elapsed": round(result.elapsed, 4),
+    }
+
+def analyse_positions(positions, depth=None, nodes=None, time_limit=None, workers=None, hash_size_mb=16,
+                      max_pending=None):
+    # Results come back in input order. At most max_pending positions are in
+    # flight, so memory stays bounded however long the input is and however
+    # far a slow position holds back the ones queued behind it.
+    workers = workers or multiprocessing.cpu_count()
+    max_pending = max_pending or workers * 4
+    pending = deque()
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(hash_size_mb,)) as pool:
+        for fen, operations in positions:
+            if len(pending) >= max_pending:
+                result, pending_operations = pending.popleft()
+                yield dict(result.get(), operations=pending_operations)
+            pending.append((pool.apply_async(analyse, (fen, depth, nodes, time_limit)), operations))
+        while pending:
+            result, pending_operations = pending.popleft()
+            yield dict(result.get(), operations=pending_operations)
+
+def format_epd(result):
+    operations = result["operations"].rstrip()
+    if operations and not operations.endswith(";"):
+        operations += ";"
+    if "error" in result:
+        analysis = f'c9 "{result["error"]}";'
+    elif "terminal" in result:
+        analysis = f'ce {result["score"]}; c0 "{result["terminal"]}";'
+    else:
+        analysis = (f'bm {result["san"]}; ce {result["score"]}; acd {result["depth"]}; acn {result["nodes"]}; '
+                    f'acs {result["elapsed"]}; c0 "{result["best_move"]}"; pv {result["san_pv"]};')
+    return " ".join(result["fen"].split()[:4] + ([operations] if operations else []) + [analysis])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search every position of a FEN/EPD file with a fixed budget.")
+    parser.add_argument("input", help="FEN or EPD file, or - for stdin")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("--format", choices=("epd", "jsonl"), default="epd")
+    parser.add_argument("--depth", type=int, default=None)
+    parser.add_argument("--nodes", type=int, default=None)
+    parser.add_argument("--movetime", type=int, default=None, help="milliseconds per position")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--hash", type=int, default=16, help="transposition table size in MB per worker")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.input == "-" else open(args.input)
+    out = open(args.output, "w") if args.output else sys.stdout
+    time_limit = args.movetime / 1000 if args.movetime else None
+    count = 0
+    total_nodes = 0
+    start = time.perf_counter()
+    try:
+        for result in analyse_positions(read_positions(source), args.depth, args.nodes, time_limit, args.workers,
+                                        args.hash):
+            if args.format == "jsonl":
+                out.write(json.dumps(result) + "\n")
+            else:
+                out.write(format_epd(result) + "\n")
+            count += 1
+            total_nodes += result.get("nodes", 0)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    print(f"{count} positions, {total_nodes} nodes in {elapsed:.2f}s", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+from game.piece import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE, BLACK, make_piece
+from game.evaluation import MIDDLEGAME_SCORES, ENDGAME_SCORES, PHASE_WEIGHTS, TOTAL_PHASE
+from game.pawns import DOUBLED_PAWN, ISOLATED_PAWN, PASSED_PAWN_MG, PASSED_PAWN_EG, SHIELD_NEAR, SHIELD_FAR
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Plane order for the 12x64 encoding: white pawn..king, then black pawn..king.
+PLANE_PIECES = [make_piece(color, kind) for color in (WHITE, BLACK) for kind in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING)]
+
+_tables = None
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("numpy is required for batch evaluation")
+
+def _score_tables():
+    # The same flattened tables the scalar evaluator sums, as arrays indexed
+    # by [piece code, square].
+    global _tables
+    if _tables is None:
+        _tables = (np.array(MIDDLEGAME_SCORES, dtype=np.int64), np.array(ENDGAME_SCORES, dtype=np.int64),
+                   np.array(PHASE_WEIGHTS[:15], dtype=np.int64))
+    return _tables
+
+def encode_positions(positions):
+    # N x 64 array of piece codes, one row per position.
+    _require_numpy()
+    return np.array([position.board for position in positions], dtype=np.int8).reshape(-1, 64)
+
+def encode_planes(positions):
+    # N x 12 x 64 occupancy planes, one per PLANE_PIECES entry.
+    codes = encode_positions(positions)
+    return (codes[:, None, :] == np.array(PLANE_PIECES, dtype=np.int8)[None, :, None]).astype(np.int8)
+
+def planes_to_codes(planes):
+    planes = np.asarray(planes)
+    return (planes * np.array(PLANE_PIECES, dtype=np.int64)[None, :, None]).sum(axis=1)
+
+def _shift_files(files, step):
+    # files[..., col] moved to col + step, with zeros shifted in.
+    shifted = np.zeros_like(files)
+    if step > 0:
+        shifted[..., step:] = files[..., :-step]
+    else:
+        shifted[..., :step] = files[..., -step:]
+    return shifted
+
+def _rows_ahead(pawns):
+    # Pawns on the rows in front of each square (lower row numbers), per
+    # file. A loop over the eight rows beats cumsum along a short axis.
+    ahead = np.zeros_like(pawns)
+    for row in range(1, 8):
+        ahead[:, row] = ahead[:, row - 1] + pawns[:, row - 1]
+    return ahead
+
+def _pawn_side(own, enemy, king):
+    # pawns.pawn_structure for one side on N x 8 x 8 pawn boards, rows
+    # oriented so that this side advances towards row 0. Per-square work
+    # stays in int8 (counts never exceed 8) to keep the arrays small.
+    own = own.astype(np.int8)
+    enemy = enemy.astype(np.int8)
+    counts = own.sum(axis=1, dtype=np.int64)
+    doubled = np.maximum(counts - 1, 0).sum(axis=1)
+    neighbours = _shift_files(counts, 1) + _shift_files(counts, -1)
+    isolated = (counts * (neighbours == 0)).sum(axis=1)
+    # Pawns on the rows in front of each square, on its own file and on the
+    # files either side.
+    own_ahead = _rows_ahead(own)
+    enemy_ahead = _rows_ahead(enemy)
+    enemy_ahead = enemy_ahead + _shift_files(enemy_ahead, 1) + _shift_files(enemy_ahead, -1)
+    passed = (own > 0) & (enemy_ahead == 0) & (own_ahead == 0)
+    # Passed pawns per row, weighted by how far that row is advanced.
+    passed_rows = passed.sum(axis=2, dtype=np.int64)
+    advance = 7 - np.arange(8)
+    middlegame = DOUBLED_PAWN[0] * doubled + ISOLATED_PAWN[0] * isolated
+    endgame = DOUBLED_PAWN[1] * doubled + ISOLATED_PAWN[1] * isolated
+    middlegame = middlegame + passed_rows @ np.array(PASSED_PAWN_MG)[advance]
+    endgame = endgame + passed_rows @ np.array(PASSED_PAWN_EG)[advance]
+    # King shelter: own pawns one and two rows in front of the king, on its
+    # file and the adjacent ones. The padding keeps edge kings in bounds.
+    padded = np.zeros((own.shape[0], 10, 10), dtype=np.int8)
+    padded[:, 2:, 1:9] = own
+    rows, cols = king // 8, king % 8
+    index = np.arange(own.shape[0])
+    near = sum(padded[index, rows + 1, cols + offset].astype(np.int64) for offset in range(3))
+    far = sum(padded[index, rows, cols + offset].astype(np.int64) for offset in range(3))
+    return middlegame + SHIELD_NEAR * near + SHIELD_FAR * far, endgame
+
+def pawn_terms(codes):
+    # (middlegame, endgame) pawn-structure arrays for N x 64 piece codes,
+    # from white's point of view. Black is scored on the boards flipped
+    # top to bottom, so both sides advance towards row 0.
+    boards = codes.reshape(-1, 8, 8)
+    white_pawns = boards == make_piece(WHITE, PAWN)
+    black_pawns = boards == make_piece(BLACK, PAWN)
+    white_king = (codes == make_piece(WHITE, KING)).argmax(axis=1)
+    black_king = (codes == make_piece(BLACK, KING)).argmax(axis=1)
+    white_mg, white_eg = _pawn_side(white_pawns, black_pawns, white_king)
+    black_mg, black_eg = _pawn_side(black_pawns[:, ::-1], white_pawns[:, ::-1], (7 - black_king // 8) * 8 + black_king % 8)
+    return white_mg - black_mg, white_eg - black_eg
+
+def evaluate_batch(data):
+    # Tapered score for every position from white's point of view: material,
+    # piece-square and pawn-structure terms, identical to
+    # Engine.evaluate_board per row. Accepts N x 64 piece codes or
+    # N x 12 x 64 planes.
+    _require_numpy()
+    data = np.asarray(data)
+    codes = planes_to_codes(data) if data.ndim == 3 else data.reshape(-1, 64)
+    codes = codes.astype(np.intp)
+    middlegame_table, endgame_table, phase_weights = _score_tables()
+    squares = np.arange(64)
+    pawn_mg, pawn_eg = pawn_terms(codes)
+    middlegame = middlegame_table[codes, squares].sum(axis=1) + pawn_mg
+    endgame = endgame_table[codes, squares].sum(axis=1) + pawn_eg
+    phase = np.minimum(phase_weights[codes].sum(axis=1), TOTAL_PHASE)
+    return (middlegame * phase + endgame * (TOTAL_PHASE - phase)) // TOTAL_PHASE
+
+def evaluate_positions(positions):
+    return evaluate_batch(encode_positions(positions))
@@ -0,0 +1,93 @@
+import argparse
+import json
+import sys
+from game.position import Position
+from game.engine import Engine
+from game.move import move_to_uci
+
+# Fixed middlegame and endgame positions; changing this list changes the
+# signature, so add positions only together with a new reference.
+BENCH_FENS = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 10",
+    "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",
+    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+    "r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP1BBPPP/R2QK2R w KQ - 2 9",
+    "2rq1rk1/pb1nbppp/1p2pn2/2pp4/3P4/1P1BPN2/PBPN1PPP/2RQ1RK1 w - - 4 12",
+    "r2q1rk1/1b1nbppp/p2ppn2/1p6/3NPP2/1BN1B3/PPP1Q1PP/R4RK1 w - - 2 12",
+    "3r1rk1/p4ppp/1pq1pn2/2b5/2P5/1P2PN2/PB3PPP/R2Q1RK1 w - - 0 17",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "8/8/4k3/3p4/3P4/4K3/8/8 w - - 0 1",
+    "8/5pk1/6p1/8/5P2/6PK/8/8 w - - 0 1",
+    "4k3/8/8/8/8/8/4P3/4K3 w - - 0 1",
+    "6k1/5ppp/8/8/8/8/r4PPP/1R4K1 w - - 0 1",
+    "8/8/8/4k3/8/8/3QK3/8 w - - 0 1",
+    "2r3k1/5pp1/p3p2p/1p1pP3/3P1P2/P1R3P1/1P4KP/8 w - - 0 30",
+    "8/3k4/8/3B4/2N5/8/4K3/8 w - - 0 1",
+]
+
+def run_bench(depth=4, hash_size_mb=16, fens=None, out=sys.stdout):
+    engine = Engine(Position.from_fen(fens[0] if fens else BENCH_FENS[0]), None, hash_size_mb=hash_size_mb)
+    results = []
+    total_nodes = 0
+    total_time = 0.0
+    pawn_probes = pawn_hits = 0
+    for index, fen in enumerate(fens or BENCH_FENS, 1):
+        # Every position starts from cold tables so the node counts and pawn
+        # hash hits do not depend on which positions ran before it.
+        engine.position = Position.from_fen(fen)
+        engine.ai_color = engine.position.turn
+        engine.transposition_table.clear()
+        engine.pawn_table.clear()
+        result = engine.search(depth=depth)
+        pawn_probes += engine.pawn_table.probes
+        pawn_hits += engine.pawn_table.hits
+        total_nodes += result.nodes
+        total_time += result.elapsed
+        results.append({
+            "fen": fen,
+            "best_move": move_to_uci(result.best_move),
+            "score": result.score,
+            "depth": result.depth,
+            "nodes": result.nodes,
+            "elapsed": round(result.elapsed, 4),
+        })
+        print(f"position {index}/{len(fens or BENCH_FENS)}  {move_to_uci(result.best_move):6} score {result.score:>7}  "
+              f"nodes {result.nodes:>9}  {result.nps} nps", file=out)
+    report = {
+        "depth": depth,
+        "hash_mb": hash_size_mb,
+        "positions": results,
+        "nodes": total_nodes,
+        "signature": total_nodes,
+        "elapsed": round(total_time, 4),
+        "nps": int(total_nodes / total_time) if total_time > 0 else 0,
+        "pawn_hash_hit_rate": round(pawn_hits / pawn_probes, 4) if pawn_probes else 0.0,
+    }
+    print("=" * 40, file=out)
+    print(f"Total time (s)  : {report['elapsed']:.3f}", file=out)
+    print(f"Nodes searched  : {report['nodes']}", file=out)
+    print(f"Nodes/second    : {report['nps']}", file=out)
+    print(f"Pawn hash hits  : {report['pawn_hash_hit_rate']:.1%}", file=out)
+    print(f"Signature       : {report['signature']}", file=out)
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search a fixed position set and report nodes and NPS.")
+    parser.add_argument("depth", nargs="?", type=int, default=4)
+    parser.add_argument("--hash", type=int, default=16, help="transposition table size in MB")
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    parser.add_argument("--expect", type=int, help="exit non-zero unless the signature matches")
+    args = parser.parse_args(argv)
+
+    report = run_bench(args.depth, args.hash)
+    if args.json:
+        with open(args.json, "w") as handle:
+            json.dump(report, handle, indent=2)
+    if args.expect is not None and report["signature"] != args.expect:
+        print(f"signature mismatch: expected {args.expect}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
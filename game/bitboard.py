@@ -0,0 +1,118 @@
+from typing import Dict, List
+
+# Bit n of a bitboard is square n (row * 8 + col, row 0 = black's back rank),
+# so "north" (towards black) is a right shift by 8.
+FULL = (1 << 64) - 1
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+ROWS = [0xFF << (8 * row) for row in range(8)]
+BIT = [1 << sq for sq in range(64)]
+
+KNIGHT_OFFSETS = [(-1, -2), (-2, -1), (-2, 1), (-1, 2), (1, 2), (2, 1), (2, -1), (1, -2)]
+KING_OFFSETS = [(0, -1), (-1, 0), (0, 1), (1, 0), (-1, -1), (1, -1), (-1, 1), (1, 1)]
+LINE_DIRECTIONS = [((1, 0), (-1, 0)), ((0, 1), (0, -1)), ((1, 1), (-1, -1)), ((1, -1), (-1, 1))]
+
+def lsb(bb):
+    return (bb & -bb).bit_length() - 1
+
+def msb(bb):
+    return bb.bit_length() - 1
+
+def popcount(bb):
+    return bb.bit_count()
+
+def squares(bb):
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+def _step_attacks(sq, offsets):
+    col, row = sq & 7, sq >> 3
+    attacks = 0
+    for dc, dr in offsets:
+        if 0 <= col + dc <= 7 and 0 <= row + dr <= 7:
+            attacks |= 1 << ((row + dr) * 8 + col + dc)
+    return attacks
+
+def _ray(sq, dc, dr):
+    ray = []
+    col, row = (sq & 7) + dc, (sq >> 3) + dr
+    while 0 <= col <= 7 and 0 <= row <= 7:
+        ray.append(row * 8 + col)
+        col += dc
+        row += dr
+    return ray
+
+def _line_table(sq, directions):
+    # A slider's attacks along one line depend only on the blockers between
+    # the square and the board edge, so every subset of those inner squares is
+    # tabulated and looked up by the masked occupancy (the dict does the job a
+    # magic multiply does in C engines).
+    rays = [_ray(sq, dc, dr) for dc, dr in directions]
+    mask = 0
+    for ray in rays:
+        for target in ray[:-1]:
+            mask |= 1 << target
+    table = {}
+    subset = 0
+    while True:
+        attacks = 0
+        for ray in rays:
+            for target in ray:
+                attacks |= 1 << target
+                if subset & (1 << target):
+                    break
+        table[subset] = attacks
+        subset = (subset - mask) & mask
+        if subset == 0:
+            break
+    return mask, table
+
+KNIGHT_ATTACKS: List[int] = [_step_attacks(sq, KNIGHT_OFFSETS) for sq in range(64)]
+KING_ATTACKS: List[int] = [_step_attacks(sq, KING_OFFSETS) for sq in range(64)]
+PAWN_ATTACKS: List[List[int]] = [
+    [_step_attacks(sq, [(-1, -1), (1, -1)]) for sq in range(64)],
+    [_step_attacks(sq, [(-1, 1), (1, 1)]) for sq in range(64)],
+]
+
+LINE_MASKS: List[List[int]] = [[], [], [], []]
+LINE_ATTACKS: List[List[Dict[int, int]]] = [[], [], [], []]
+for _line, _directions in enumerate(LINE_DIRECTIONS):
+    for _sq in range(64):
+        _mask, _table = _line_table(_sq, _directions)
+        LINE_MASKS[_line].append(_mask)
+        LINE_ATTACKS[_line].append(_table)
+
+RANK_MASKS, FILE_MASKS, DIAGONAL_MASKS, ANTI_DIAGONAL_MASKS = LINE_MASKS
+RANK_ATTACKS, FILE_ATTACKS, DIAGONAL_ATTACKS, ANTI_DIAGONAL_ATTACKS = LINE_ATTACKS
+
+def rook_attacks(sq, occupied):
+    return RANK_ATTACKS[sq][occupied & RANK_MASKS[sq]] | FILE_ATTACKS[sq][occupied & FILE_MASKS[sq]]
+
+def bishop_attacks(sq, occupied):
+    return DIAGONAL_ATTACKS[sq][occupied & DIAGONAL_MASKS[sq]] | ANTI_DIAGONAL_ATTACKS[sq][occupied & ANTI_DIAGONAL_MASKS[sq]]
+
+def queen_attacks(sq, occupied):
+    return rook_attacks(sq, occupied) | bishop_attacks(sq, occupied)
+
+def _build_line_tables():
+    between = [[0] * 64 for _ in range(64)]
+    line = [[0] * 64 for _ in range(64)]
+    for sq in range(64):
+        for directions in LINE_DIRECTIONS:
+            full_line = BIT[sq]
+            for dc, dr in directions:
+                for target in _ray(sq, dc, dr):
+                    full_line |= BIT[target]
+            for dc, dr in directions:
+                path = 0
+                for target in _ray(sq, dc, dr):
+                    between[sq][target] = path
+                    line[sq][target] = full_line
+                    path |= BIT[target]
+    return between, line
+
+# BETWEEN[a][b]: squares strictly between two aligned squares.
+# LINE[a][b]: the whole rank, file or diagonal through both (0 if unaligned).
+BETWEEN, LINE = _build_line_tables()
@@ -1,6 +1,8 @@
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Tuple
 import pygame
-from game.piece import Piece, PieceType, PieceColor
+from game.piece import PieceType, PieceColor, EMPTY, make_piece, asset_name
+from game.position import Position, STARTING_FEN
+from game.move import NO_SQUARE, square
 from utils.gameobject import GameObject
 import globals
 from utils.image import load_image, draw_image
@@ -12,52 +14,53 @@ class Board(GameObject):
         self.light_cell_color: Tuple[int, int, int] = light_cell_color
         self.dark_cell_color: Tuple[int, int, int] = dark_cell_color
         self.square_size: int = square_size
-        self.representation: Dict[Tuple[int, int], Piece] = {}
+        self.position: Position = None
         self.screen = screen
+        self.hidden_square: int = NO_SQUARE
+        self.piece_images: Dict[int, pygame.Surface] = {}
         self.setup_initial_board()
+        self.load_piece_images()
         self.overlay_image = load_image("assets/overlay.png", self.square_size, self.square_size, 0.3)
+        self.background = self.render_background()
+        # What each square showed when last drawn, as (piece, overlay); None
+        # forces the square to be redrawn on the next update.
+        self.drawn = [None] * 64
     
     def update(self):
-        self.draw_board()
-        self.draw_pieces()
-        self.draw_legal_moves()
+        # Redraws only the squares whose piece, visibility or legal-move
+        # overlay changed since the last frame and returns their rects for
+        # pygame.display.update.
+        game = globals.game_instance
+        targets = {square(col, row) for col, row in game.legal_moves} if game.legal_moves else ()
+        rects = []
+        for sq, piece in enumerate(self.position.board):
+            state = (EMPTY if sq == self.hidden_square else piece, sq in targets)
+            if self.drawn[sq] != state:
+                self.drawn[sq] = state
+                rects.append(self.draw_square(sq, *state))
+        return rects
+
+    def invalidate(self, rect=None):
+        # Marks the squares under rect (or the whole board) for redrawing,
+        # e.g. after a dragged piece or a dialog was drawn over them.
+        if rect is None:
+            self.drawn = [None] * 64
+            return
+        rect = rect.clip(pygame.Rect(0, 0, self.columns * self.square_size, self.rows * self.square_size))
+        if not rect.width or not rect.height:
+            return
+        for row in range(rect.top // self.square_size, (rect.bottom - 1) // self.square_size + 1):
+            for col in range(rect.left // self.square_size, (rect.right - 1) // self.square_size + 1):
+                self.drawn[square(col, row)] = None
         
     def setup_initial_board(self):
-        self.representation.update({
-            (0, 0): Piece(PieceColor.BLACK, PieceType.ROOK, self.square_size, self.square_size),
-            (1, 0): Piece(PieceColor.BLACK, PieceType.KNIGHT, self.square_size, self.square_size),
-            (2, 0): Piece(PieceColor.BLACK, PieceType.BISHOP, self.square_size, self.square_size),
-            (3, 0): Piece(PieceColor.BLACK, PieceType.QUEEN, self.square_size, self.square_size),
-            (4, 0): Piece(PieceColor.BLACK, PieceType.KING, self.square_size, self.square_size),
-            (5, 0): Piece(PieceColor.BLACK, PieceType.BISHOP, self.square_size, self.square_size),
-            (6, 0): Piece(PieceColor.BLACK, PieceType.KNIGHT, self.square_size, self.square_size),
-            (7, 0): Piece(PieceColor.BLACK, PieceType.ROOK, self.square_size, self.square_size),
-            (0, 1): Piece(PieceColor.BLACK, PieceType.PAWN, self.square_size, self.square_size),
-            (1, 1): Piece(PieceColor.BLACK, PieceType.PAWN, self.square_size, self.square_size),
-            (2, 1): Piece(PieceColor.BLACK, PieceType.PAWN, self.square_size, self.square_size),
-            (3, 1): Piece(PieceColor.BLACK, PieceType.PAWN, self.square_size, self.square_size),
-            (4, 1): Piece(PieceColor.BLACK, PieceType.PAWN, self.square_size, self.square_size),
-            (5, 1): Piece(PieceColor.BLACK, PieceType.PAWN, self.square_size, self.square_size),
-            (6, 1): Piece(PieceColor.BLACK, PieceType.PAWN, self.square_size, self.square_size),
-            (7, 1): Piece(PieceColor.BLACK, PieceType.PAWN, self.square_size, self.square_size),
-            
-            (0, 6): Piece(PieceColor.WHITE, PieceType.PAWN, self.square_size, self.square_size),
-            (1, 6): Piece(PieceColor.WHITE, PieceType.PAWN, self.square_size, self.square_size),
-            (2, 6): Piece(PieceColor.WHITE, PieceType.PAWN, self.square_size, self.square_size),
-            (3, 6): Piece(PieceColor.WHITE, PieceType.PAWN, self.square_size, self.square_size),
-            (4, 6): Piece(PieceColor.WHITE, PieceType.PAWN, self.square_size, self.square_size),
-            (5, 6): Piece(PieceColor.WHITE, PieceType.PAWN, self.square_size, self.square_size),
-            (6, 6): Piece(PieceColor.WHITE, PieceType.PAWN, self.square_size, self.square_size),
-            (7, 6): Piece(PieceColor.WHITE, PieceType.PAWN, self.square_size, self.square_size),
-            (0, 7): Piece(PieceColor.WHITE, PieceType.ROOK, self.square_size, self.square_size),
-            (1, 7): Piece(PieceColor.WHITE, PieceType.KNIGHT, self.square_size, self.square_size),
-            (2, 7): Piece(PieceColor.WHITE, PieceType.BISHOP, self.square_size, self.square_size),
-            (3, 7): Piece(PieceColor.WHITE, PieceType.QUEEN, self.square_size, self.square_size),
-            (4, 7): Piece(PieceColor.WHITE, PieceType.KING, self.square_size, self.square_size),
-            (5, 7): Piece(PieceColor.WHITE, PieceType.BISHOP, self.square_size, self.square_size),
-            (6, 7): Piece(PieceColor.WHITE, PieceType.KNIGHT, self.square_size, self.square_size),
-            (7, 7): Piece(PieceColor.WHITE, PieceType.ROOK, self.square_size, self.square_size),
-        })
+        self.position = Position.from_fen(STARTING_FEN)
+
+    def load_piece_images(self):
+        for color in PieceColor:
+            for piece_type in PieceType:
+                piece = make_piece(color, piece_type)
+                self.piece_images[piece] = load_image(f"assets/{asset_name(piece)}.png", self.square_size, self.square_size)
         
     @staticmethod
     def is_light(row, col):
@@ -68,48 +71,32 @@ class Board(GameObject):
             light = False
         return light
     
-    def draw_board(self):
+    def render_background(self):
+        # The empty board never changes, so it is drawn once and squares are
+        # restored from it.
+        background = pygame.Surface((self.columns * self.square_size, self.rows * self.square_size))
         for row in range(self.rows):
             for col in range(self.columns):
                 light = self.is_light(row, col)
                 color = self.light_cell_color if light else self.dark_cell_color
-                pygame.draw.rect(self.screen, color, (col * self.square_size, row * self.square_size, self.square_size, self.square_size))
+                pygame.draw.rect(background, color, (col * self.square_size, row * self.square_size, self.square_size, self.square_size))
+        return background
 
-    def draw_pieces(self):
-        for pos, piece in self.representation.items():
-            if piece is not None and piece.showing == True:
-                col, row = pos
-                piece_rect = piece.image.get_rect()
-                x = col * self.square_size + (self.square_size - piece_rect.width) // 2
-                y = row * self.square_size + (self.square_size - piece_rect.height) // 2
-                draw_image(piece.image, self.screen, x, y)
-    
-    def draw_legal_moves(self):
-        game = globals.game_instance
-        if game.legal_moves:
-            for (col, row) in game.legal_moves:
-                image_rect = self.overlay_image.get_rect()
-                x = col * self.square_size + (self.square_size - image_rect.width) // 2
-                y = row * self.square_size + (self.square_size - image_rect.height) // 2
-                draw_image(self.overlay_image, self.screen, x, y)
-    
-    def get_piece_obj_on_pos(self, pos: Tuple[int, int]) -> Optional[Piece]:
-        if pos in self.representation:
-            return self.representation[pos]
-        else:
-            return None
-    
-    def generate_threat_map(self, color: PieceColor, clone_representation):
-        threat_map = []
-        coord_pieces = self.get_all_pieces_of_color(color, clone_representation)
-        for coord, piece in coord_pieces:
-            moves = piece.get_legal_moves(coord, clone_representation)
-            threat_map.extend(moves)
-        return threat_map 
+    def draw_square(self, sq, piece, overlay):
+        col, row = sq & 7, sq >> 3
+        rect = pygame.Rect(col * self.square_size, row * self.square_size, self.square_size, self.square_size)
+        self.screen.blit(self.background, rect.topleft, rect)
+        if piece != EMPTY:
+            self.draw_centered(self.piece_images[piece], rect)
+        if overlay:
+            self.draw_centered(self.overlay_image, rect)
+        return rect
 
-    def get_all_pieces_of_color(self, color: PieceColor, clone_representation):
-        pieces = []
-        for coord, piece in clone_representation.items():
-            if piece.color == color:
-                pieces.append((coord, piece))
-        return pieces
+    def draw_centered(self, image, rect):
+        image_rect = image.get_rect()
+        x = rect.x + (self.square_size - image_rect.width) // 2
+        y = rect.y + (self.square_size - image_rect.height) // 2
+        draw_image(image, self.screen, x, y)
+    
+    def get_piece_on_square(self, sq: int) -> int:
+        return self.position.board[sq]
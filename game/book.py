@@ -0,0 +1,139 @@
+import argparse
+import mmap
+import random
+import struct
+import sys
+from game.position import Position, STARTING_FEN
+from game.movegen import legal_moves
+from game.move import FLAG_CASTLE, move_to_uci
+from game.piece import KNIGHT, BISHOP, ROOK, QUEEN
+from utils.polyglot import polyglot_key
+
+# Polyglot books: 16-byte big-endian entries (key, move, weight, learn)
+# sorted by polyglot_key, so books built by other Polyglot tools work here
+# and the other way round.
+ENTRY = struct.Struct(">QHHI")
+ENTRY_SIZE = ENTRY.size
+PROMOTION_CODES = {0: 0, KNIGHT: 1, BISHOP: 2, ROOK: 3, QUEEN: 4}
+MAX_WEIGHT = 0xFFFF
+
+def _polyglot_square(sq):
+    # Polyglot counts rows from white's back rank.
+    return (7 - (sq >> 3)) * 8 + (sq & 7)
+
+def encode_book_move(move):
+    from_sq = move & 63
+    to_sq = (move >> 6) & 63
+    if move >> 15 == FLAG_CASTLE:
+        # Castling is stored as the king taking its own rook.
+        to_sq = to_sq + 1 if to_sq > from_sq else to_sq - 2
+    promotion = PROMOTION_CODES[(move >> 12) & 7]
+    return _polyglot_square(to_sq) | (_polyglot_square(from_sq) << 6) | (promotion << 12)
+
+def decode_book_move(position: Position, raw):
+    # Matches the stored move against the legal moves, so a corrupt entry or
+    # a key collision can never produce an illegal move.
+    for move in legal_moves(position):
+        if encode_book_move(move) == raw:
+            return move
+    return None
+
+def write_book(path, entries):
+    # entries: iterable of (key, move, weight) with engine moves; equal
+    # key/move pairs are merged and weights scaled into 16 bits.
+    merged = {}
+    for key, move, weight in entries:
+        raw = encode_book_move(move)
+        merged[key, raw] = merged.get((key, raw), 0) + weight
+    scale = max(merged.values(), default=0) / MAX_WEIGHT
+    with open(path, "wb") as handle:
+        for (key, raw), weight in sorted(merged.items(), key=lambda item: (item[0][0], -item[1])):
+            if scale > 1:
+                weight = max(1, int(weight / scale))
+            handle.write(ENTRY.pack(key, raw, weight, 0))
+    return len(merged)
+
+class OpeningBook:
+    # Read-only view of a book file through mmap; lookups binary-search the
+    # mapped bytes, so nothing is loaded up front and processes opening the
+    # same file share it through the page cache.
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.data = None
+        self.file.seek(0, 2)
+        self.size = self.file.tell() // ENTRY_SIZE
+        if self.size:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def key_at(self, index):
+        return struct.unpack_from(">Q", self.data, index * ENTRY_SIZE)[0]
+
+    def entries(self, key):
+        # (raw move, weight) of every entry for the key.
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self.key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        found = []
+        while low < self.size:
+            entry_key, raw, weight, _ = ENTRY.unpack_from(self.data, low * ENTRY_SIZE)
+            if entry_key != key:
+                break
+            found.append((raw, weight))
+            low += 1
+        return found
+
+    def moves(self, position: Position):
+        found = []
+        for raw, weight in self.entries(polyglot_key(position)):
+            move = decode_book_move(position, raw)
+            if move is not None:
+                found.append((move, weight))
+        return found
+
+    def choose(self, position: Position, rng=random, best=False):
+        # Weighted random pick among the book moves, or the heaviest one.
+        found = [(move, weight) for move, weight in self.moves(position) if weight > 0]
+        if not found:
+            return None
+        if best:
+            return max(found, key=lambda item: item[1])[0]
+        pick = rng.randrange(sum(weight for _, weight in found))
+        for move, weight in found:
+            pick -= weight
+            if pick < 0:
+                return move
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List the book moves stored for a position.")
+    parser.add_argument("book")
+    parser.add_argument("--fen", default=STARTING_FEN)
+    args = parser.parse_args(argv)
+
+    position = Position.from_fen(args.fen)
+    with OpeningBook(args.book) as book:
+        print(f"{book.size} entries")
+        found = book.moves(position)
+        total = sum(weight for _, weight in found) or 1
+        for move, weight in sorted(found, key=lambda item: -item[1]):
+            print(f"{move_to_uci(move):6} weight {weight:>6}  {100 * weight / total:5.1f}%")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,218 +1,431 @@
-from game.board import Board
-from game.piece import PieceColor, Piece, PieceType
-import globals
-import math
+from game.position import Position
+from game.piece import PieceColor, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, WHITE
+from game.movegen import generate_legal_moves, legal_moves, in_check, static_exchange, SEE_VALUES
+from game.move import NO_MOVE, FLAG_EN_PASSANT
+from game.transposition import TranspositionTable, EXACT, LOWER, UPPER
+from game.evaluation import PIECE_VALUES, PIECE_SQUARE_TABLES, evaluate, taper
+from game.pawns import PawnHashTable
+import time
+
+MAX_DEPTH = 64
+MAX_PLY = 128
+INFINITY = 1000000
+MATE_SCORE = 100000
+
+HASH_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 29
+KILLER_SCORE = 1 << 28
+LOSING_CAPTURE_SCORE = -(1 << 20)
+
+def score_to_tt(score, ply):
+    # Mate scores are stored relative to the node so they stay valid when the
+    # same position is reached at a different distance from the root.
+    if score >= MATE_SCORE - MAX_PLY:
+        return score + ply
+    if score <= -MATE_SCORE + MAX_PLY:
+        return score - ply
+    return score
+
+def score_from_tt(score, ply):
+    if score >= MATE_SCORE - MAX_PLY:
+        return score - ply
+    if score <= -MATE_SCORE + MAX_PLY:
+        return score + ply
+    return score
+
+class SearchAborted(Exception):
+    pass
+
+class SearchResult:
+    def __init__(self, best_move=NO_MOVE, score=0, depth=0, nodes=0, elapsed=0.0, pv=None):
+        self.best_move = best_move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.elapsed = elapsed
+        # Expected line from the root, starting with best_move.
+        self.pv = pv if pv is not None else ([best_move] if best_move else [])
+
+    @property
+    def nps(self):
+        return int(self.nodes / self.elapsed) if self.elapsed > 0 else 0
 
 class Engine:
-    def __init__(self, board: Board, ai_color: PieceColor):
-        self.board = board
+    def __init__(self, position: Position, ai_color: PieceColor, hash_size_mb=16, search_depth=3, transposition_table=None,
+                 book=None, tablebases=None):
+        self.position = position
         self.ai_color = ai_color
-        self.piece_values = {
-            PieceType.PAWN: 100,
-            PieceType.KNIGHT: 320,
-            PieceType.BISHOP: 330,
-            PieceType.ROOK: 500,
-            PieceType.QUEEN: 900,
-            PieceType.KING: 0
-        }
-        self.transposition_table = {}
-
-        self.piece_square_tables = {
-            PieceType.PAWN: [
-                [0, 0, 0, 0, 0, 0, 0, 0],
-                [50, 50, 50, 50, 50, 50, 50, 50],
-                [10, 10, 20, 30, 30, 20, 10, 10],
-                [5, 5, 10, 25, 25, 10, 5, 5],
-                [0, 0, 0, 20, 20, 0, 0, 0],
-                [5, -5, -10, 0, 0, -10, -5, 5],
-                [5, 10, 10, -20, -20, 10, 10, 5],
-                [0, 0, 0, 0, 0, 0, 0, 0]
-            ],
-            PieceType.KNIGHT: [
-                [-50, -40, -30, -30, -30, -30, -40, -50],
-                [-40, -20, 0, 5, 5, 0, -20, -40],
-                [-30, 5, 10, 15, 15, 10, 5, -30],
-                [-30, 0, 15, 20, 20, 15, 0, -30],
-                [-30, 5, 15, 20, 20, 15, 5, -30],
-                [-30, 0, 10, 15, 15, 10, 0, -30],
-                [-40, -20, 0, 0, 0, 0, -20, -40],
-                [-50, -40, -30, -30, -30, -30, -40, -50]
-            ],
-            PieceType.BISHOP: [
-                [-20, -10, -10, -10, -10, -10, -10, -20],
-                [-10, 0, 0, 0, 0, 0, 0, -10],
-                [-10, 0, 5, 10, 10, 5, 0, -10],
-                [-10, 5, 5, 10, 10, 5, 5, -10],
-                [-10, 0, 10, 10, 10, 10, 0, -10],
-                [-10, 10, 10, 10, 10, 10, 10, -10],
-                [-10, 5, 0, 0, 0, 0, 5, -10],
-                [-20, -10, -10, -10, -10, -10, -10, -20]
-            ],
-            PieceType.ROOK: [
-                [0, 0, 0, 0, 0, 0, 0, 0],
-                [5, 10, 10, 10, 10, 10, 10, 5],
-                [-5, 0, 0, 0, 0, 0, 0, -5],
-                [-5, 0, 0, 0, 0, 0, 0, -5],
-                [-5, 0, 0, 0, 0, 0, 0, -5],
-                [-5, 0, 0, 0, 0, 0, 0, -5],
-                [-5, 0, 0, 0, 0, 0, 0, -5],
-                [0, 0, 0, 5, 5, 0, 0, 0]
-            ],
-            PieceType.QUEEN: [
-                [-20, -10, -10, -5, -5, -10, -10, -20],
-                [-10, 0, 0, 0, 0, 0, 0, -10],
-                [-10, 0, 5, 5, 5, 5, 0, -10],
-                [-5, 0, 5, 5, 5, 5, 0, -5],
-                [0, 0, 5, 5, 5, 5, 0, -5],
-                [-10, 5, 5, 5, 5, 5, 0, -10],
-                [-10, 0, 5, 0, 0, 0, 0, -10],
-                [-20, -10, -10, -5, -5, -10, -10, -20]
-            ],
-            PieceType.KING: [
-                [-30, -40, -40, -50, -50, -40, -40, -30],
-                [-30, -40, -40, -50, -50, -40, -40, -30],
-                [-30, -40, -40, -50, -50, -40, -40, -30],
-                [-30, -40, -40, -50, -50, -40, -40, -30],
-                [-20, -30, -30, -40, -40, -30, -30, -20],
-                [-10, -20, -20, -20, -20, -20, -20, -10],
-                [20, 20, 0, 0, 0, 0, 20, 20],
-                [20, 30, 10, 0, 0, 10, 30, 20]
-            ]
-        }
-
-    def make_move(self):
-        legal_moves = self.get_all_legal_moves()
-        capture_moves = [move for move in legal_moves if self.is_capture(move)]
-        if capture_moves:
-            best_capture_move = self.choose_best_capture(capture_moves)
-            piece, start_pos, end_pos = best_capture_move
-        else:
-            _, best_move = self.minimax(self.board, 3, -math.inf, math.inf, True)
-            if best_move:
-                piece, start_pos, end_pos = best_move
-        self.execute_move(piece, start_pos, end_pos)
+        self.search_depth = search_depth
+        self.nodes = 0
+        self.node_limit = None
+        self.deadline = None
+        self.stop_event = None
+        self.root_best_move = NO_MOVE
+        self.killers = [[NO_MOVE, NO_MOVE] for _ in range(MAX_PLY)]
+        self.history = [[0] * 4096, [0] * 4096]
+        # Triangular PV table: row ply holds the best line found from that
+        # ply, built from the row below whenever a move raises alpha.
+        self.pv_table = [[] for _ in range(MAX_PLY + 1)]
+        self.piece_values = PIECE_VALUES
+        self.piece_square_tables = PIECE_SQUARE_TABLES
+        if transposition_table is None:
+            transposition_table = TranspositionTable(hash_size_mb)
+        self.transposition_table = transposition_table
+        # Set to None to evaluate material and piece-square tables only.
+        self.pawn_table = PawnHashTable()
+        # Selective search. Each technique can be switched off or tuned on its
+        # own (match.py sets these as key=value options) for A/B testing.
+        self.null_move = True
+        self.null_move_min_depth = 3
+        self.null_move_reduction = 2
+        self.late_move_reductions = True
+        self.lmr_min_depth = 3
+        self.lmr_full_moves = 3
+        self.lmr_reduction = 1
+        self.futility = True
+        self.futility_depth = 2
+        self.futility_margin = 150
+        self.reverse_futility = True
+        self.reverse_futility_depth = 3
+        self.reverse_futility_margin = 120
+        self.principal_variation_search = True
+        self.aspiration = True
+        self.aspiration_min_depth = 4
+        self.aspiration_window = 50
+        self.book = book
+        self.tablebases = tablebases
+
+    def make_move(self, depth=None, nodes=None, time_limit=None, stop_event=None):
+        best_move = self.search(depth, nodes, time_limit, stop_event).best_move
+        if best_move:
+            self.execute_move(best_move)
+        return best_move
+
+    def search(self, depth=None, nodes=None, time_limit=None, stop_event=None, start_depth=1, infinite=False,
+               on_iteration=None):
+        # Iterative deepening: each completed iteration leaves its best move in
+        # the TT to be tried first by the next one, and when a budget runs out
+        # mid-iteration the last completed result is returned. An infinite
+        # search only ends on the stop event (or a forced mate). Book moves
+        # and tablebase moves are played without searching, except in
+        # infinite analysis.
+        if self.book is not None and not infinite:
+            book_move = self.book.choose(self.position)
+            if book_move:
+                return SearchResult(book_move)
+        if self.tablebases is not None and not infinite:
+            probe = self.tablebases.best_move(self.position, MATE_SCORE)
+            if probe is not None:
+                return SearchResult(probe[0], probe[1])
+        if depth is None:
+            depth = MAX_DEPTH if nodes or time_limit or infinite else self.search_depth
+        start = time.perf_counter()
+        self.transposition_table.new_search()
+        self.nodes = 0
+        self.node_limit = nodes
+        self.deadline = start + time_limit if time_limit else None
+        self.stop_event = stop_event
+        self.killers = [[NO_MOVE, NO_MOVE] for _ in range(MAX_PLY)]
+        self.history = [[0] * 4096, [0] * 4096]
+        root_ply = len(self.position.undo_stack)
+        result = SearchResult()
+        for iteration_depth in range(min(start_depth, depth), min(depth, MAX_DEPTH) + 1):
+            self.root_best_move = NO_MOVE
+            try:
+                score = self.aspiration_search(iteration_depth, result.score if result.best_move else None)
+            except SearchAborted:
+                while len(self.position.undo_stack) > root_ply:
+                    if self.position.undo_stack[-1][0] == NO_MOVE:
+                        self.position.unmake_null_move()
+                    else:
+                        self.position.unmake_move()
+                break
+            pv = self.pv_table[0] if self.pv_table[0][:1] == [self.root_best_move] else [self.root_best_move]
+            result = SearchResult(self.root_best_move, score, iteration_depth, self.nodes, time.perf_counter() - start,
+                                  list(pv) if self.root_best_move else [])
+            if on_iteration is not None:
+                on_iteration(result)
+            if not self.root_best_move or abs(score) >= MATE_SCORE - MAX_PLY:
+                break
+        if not result.best_move:
+            moves = self.get_all_legal_moves()
+            if moves:
+                result.best_move = next(self.order_moves(moves, 0))
+                result.pv = [result.best_move]
+        result.nodes = self.nodes
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    def aspiration_search(self, depth, previous_score):
+        # Search a narrow window around the previous iteration's score and
+        # widen the failing side until the score lands inside it.
+        if (not self.aspiration or previous_score is None or depth < self.aspiration_min_depth
+                or abs(previous_score) >= MATE_SCORE - MAX_PLY):
+            return self.negamax(depth, -INFINITY, INFINITY, 0)
+        window = self.aspiration_window
+        alpha, beta = previous_score - window, previous_score + window
+        while True:
+            score = self.negamax(depth, alpha, beta, 0)
+            if score <= alpha:
+                alpha = max(score - window, -INFINITY)
+            elif score >= beta:
+                beta = min(score + window, INFINITY)
+            else:
+                return score
+            window *= 2
+
+    def check_limits(self):
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise SearchAborted()
+        if self.nodes & 1023 == 0:
+            if self.deadline is not None and time.perf_counter() >= self.deadline:
+                raise SearchAborted()
+            if self.stop_event is not None and self.stop_event.is_set():
+                raise SearchAborted()
 
     def is_capture(self, move):
-        _, _, end_pos = move
-        captured_piece = self.board.representation.get(end_pos)
-        return captured_piece and captured_piece.color != self.ai_color
-    
-    def choose_best_capture(self, capture_moves):
-        capture_evaluations = []
-        for move in capture_moves:
-            piece, start_pos, end_pos = move
-            captured_piece = self.board.representation.get(end_pos)
-            self.execute_move(piece, start_pos, end_pos)
-            board_eval = self.evaluate_board()
-            self.undo_move(piece, start_pos, end_pos, captured_piece)
-            capture_evaluations.append((board_eval, move))
-        sorted_capture_moves = sorted(capture_evaluations, key=lambda x: -x[0])
-        return sorted_capture_moves[0][1]
-
-    def order_moves(self, legal_moves):
-        ordered_moves = []
-        for move in legal_moves:
-            piece, _, end_pos = move
-            captured_piece = self.board.representation.get(end_pos)
-            capture_value = self.piece_values.get(captured_piece.name, 0) if captured_piece else 0
-            if capture_value > 0:
-                ordered_moves.append((capture_value + 1000, move))  
+        return self.position.is_capture(move)
+
+    def score_moves(self, moves, ply, hash_move=NO_MOVE):
+        # Hash move, then captures and promotions by MVV-LVA, then the two
+        # killers of this ply, then quiet moves by history score, then captures
+        # that lose material.
+        position = self.position
+        board = position.board
+        killer_one, killer_two = self.killers[ply] if ply < MAX_PLY else (NO_MOVE, NO_MOVE)
+        history = self.history[position.turn]
+        scores = []
+        for move in moves:
+            if move == hash_move:
+                scores.append(HASH_MOVE_SCORE)
+                continue
+            victim = board[(move >> 6) & 63] & 7
+            promotion = (move >> 12) & 7
+            if victim or promotion or move >> 15 == FLAG_EN_PASSANT:
+                # A capture of a cheaper piece only keeps its MVV-LVA slot if
+                # the exchange on the square does not lose material; losing
+                # captures go after every quiet move.
+                attacker = board[move & 63] & 7
+                if SEE_VALUES[victim] < SEE_VALUES[attacker] and not promotion:
+                    exchange = static_exchange(position, move)
+                    if exchange < 0:
+                        scores.append(LOSING_CAPTURE_SCORE + exchange)
+                        continue
+                scores.append(CAPTURE_SCORE + (victim or PAWN) * 10 + promotion * 10 - attacker)
+            elif move == killer_one:
+                scores.append(KILLER_SCORE)
+            elif move == killer_two:
+                scores.append(KILLER_SCORE - 1)
             else:
-                ordered_moves.append((0, move))
-        return [move for _, move in sorted(ordered_moves, key=lambda x: -x[0])]
+                scores.append(history[move & 4095])
+        return scores
+
+    def order_moves(self, moves, ply, hash_move=NO_MOVE):
+        # Selection-style picking: only as much of the list is ordered as the
+        # search consumes before a cutoff.
+        scores = self.score_moves(moves, ply, hash_move)
+        moves = list(moves)
+        count = len(moves)
+        for index in range(count):
+            best = max(range(index, count), key=scores.__getitem__)
+            if best != index:
+                moves[index], moves[best] = moves[best], moves[index]
+                scores[index], scores[best] = scores[best], scores[index]
+            yield moves[index]
 
+    def update_quiet_move_stats(self, move, depth, ply):
+        if ply < MAX_PLY and self.killers[ply][0] != move:
+            self.killers[ply][1] = self.killers[ply][0]
+            self.killers[ply][0] = move
+        history = self.history[self.position.turn]
+        history[move & 4095] += depth * depth
+        if history[move & 4095] >= KILLER_SCORE - 1:
+            for index in range(4096):
+                history[index] >>= 1
 
     def get_all_legal_moves(self):
-        game = globals.game_instance
-        legal_moves = []
-        for pos, piece in game.board.representation.items():
-            if piece.color == self.ai_color:
-                moves = piece.get_legal_moves(pos, game.board.representation)
-                for move in moves:
-                    if not game.king_will_be_in_danger(game.board.representation, pos, piece, move, self.ai_color):
-                        legal_moves.append((piece, pos, move))
-        return legal_moves
-
-    def execute_move(self, piece: Piece, start_pos, end_pos):
-        del self.board.representation[start_pos]
-        self.board.representation[end_pos] = piece
-        piece.increment_num_of_moves()
+        return list(generate_legal_moves(self.position))
+
+    def execute_move(self, move):
+        self.position.make_move(move)
 
     def evaluate_board(self):
-        score = 0
-        for pos, piece in self.board.representation.items():
-            piece_value = self.piece_values.get(piece.name, 0)
-            table = self.piece_square_tables.get(piece.name, [[0]*8 for _ in range(8)])
-            row, col = pos
-
-            if piece.color == PieceColor.WHITE:
-                score += piece_value + table[row][col]
+        position = self.position
+        if self.pawn_table is None:
+            return evaluate(position)
+        pawn_mg, pawn_eg = self.pawn_table.probe(position)
+        return taper(position.mg_score + pawn_mg, position.eg_score + pawn_eg, position.phase)
+
+    def evaluate(self):
+        score = self.evaluate_board()
+        return score if self.position.turn == WHITE else -score
+
+    def negamax(self, depth, alpha, beta, ply):
+        if depth <= 0 or ply >= MAX_PLY - 1:
+            return self.quiescence(alpha, beta, ply)
+        self.nodes += 1
+        self.check_limits()
+        self.pv_table[ply] = []
+        position = self.position
+        # Only nodes searched with an open window can end up on the PV; the
+        # rest are null-window scouts.
+        pv_node = beta - alpha > 1
+        if self.tablebases is not None and ply > 0:
+            score = self.tablebases.probe_score(position, ply, MATE_SCORE)
+            if score is not None:
+                return score
+        board_hash = position.key
+        hash_move = NO_MOVE
+        entry = self.transposition_table.probe(board_hash)
+        if entry is not None:
+            entry_depth, entry_score, entry_bound, entry_move = entry
+            hash_move = entry_move
+            if entry_depth >= depth and ply > 0 and not pv_node:
+                entry_score = score_from_tt(entry_score, ply)
+                if entry_bound == EXACT:
+                    return entry_score
+                if entry_bound == LOWER:
+                    alpha = max(alpha, entry_score)
+                elif entry_bound == UPPER:
+                    beta = min(beta, entry_score)
+                if alpha >= beta:
+                    return entry_score
+        moves = self.get_all_legal_moves()
+        checked = in_check(position)
+        if not moves:
+            return -MATE_SCORE + ply if checked else 0
+        static_eval = None
+        if not checked and not pv_node and ply > 0 and abs(beta) < MATE_SCORE - MAX_PLY:
+            static_eval = self.evaluate()
+            # Reverse futility: a shallow node whose static score beats beta by
+            # a depth-scaled margin is assumed to fail high.
+            if (self.reverse_futility and depth <= self.reverse_futility_depth
+                    and static_eval - self.reverse_futility_margin * depth >= beta):
+                return static_eval - self.reverse_futility_margin * depth
+            # Null move: if passing still fails high after a reduced search,
+            # a real move almost surely would. Skipped after another null
+            # move and without pieces, where zugzwang makes passing the best
+            # option.
+            if (self.null_move and depth >= self.null_move_min_depth and static_eval >= beta
+                    and position.undo_stack[-1][0] != NO_MOVE
+                    and self.has_non_pawn_material(position.turn)):
+                position.make_null_move()
+                score = -self.negamax(depth - 1 - self.null_move_reduction, -beta, -beta + 1, ply + 1)
+                position.unmake_null_move()
+                if score >= beta:
+                    return beta if score >= MATE_SCORE - MAX_PLY else score
+        futile = (self.futility and static_eval is not None and depth <= self.futility_depth
+                  and static_eval + self.futility_margin * depth <= alpha)
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = NO_MOVE
+        killers = self.killers[ply] if ply < MAX_PLY else ()
+
+        for index, move in enumerate(self.order_moves(moves, ply, hash_move)):
+            quiet = not position.is_capture(move) and not (move >> 12) & 7
+            reducible = (quiet and index > 0 and not checked and move not in killers
+                         and (futile or (self.late_move_reductions and depth >= self.lmr_min_depth
+                                         and index >= self.lmr_full_moves)))
+            self.execute_move(move)
+            if reducible and not in_check(position):
+                if futile:
+                    # Futility: a quiet move cannot lift a hopeless frontier
+                    # node above alpha.
+                    self.undo_move()
+                    best_score = max(best_score, static_eval + self.futility_margin * depth)
+                    continue
+                # Late quiet moves are scouted shallower first and only
+                # searched at full depth if they beat alpha.
+                score = -self.negamax(depth - 1 - self.lmr_reduction, -alpha - 1, -alpha, ply + 1)
+                if score > alpha:
+                    score = self.search_move(depth, alpha, beta, ply)
+            elif index > 0:
+                score = self.search_move(depth, alpha, beta, ply)
             else:
-                score -= piece_value + table[7 - row][col]
+                score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            self.undo_move()
 
-            
-            captured_piece = self.board.representation.get(pos)
-            if captured_piece:
-                captured_value = self.piece_values.get(captured_piece.name, 0)
-                score += captured_value if piece.color == PieceColor.WHITE else -captured_value
-        return score
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if ply == 0:
+                    self.root_best_move = move
+            if score > alpha:
+                alpha = score
+                self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+            if alpha >= beta:
+                if quiet:
+                    self.update_quiet_move_stats(move, depth, ply)
+                break
 
-    def minimax(self, board: Board, depth, alpha, beta, maximizing_player):
-        board_hash = hash(frozenset(board.representation.items()))
-        if board_hash in self.transposition_table and self.transposition_table[board_hash]["depth"] >= depth:
-            return self.transposition_table[board_hash]["evaluation"], self.transposition_table[board_hash]["best_move"]
-        if depth == 0:
-            evaluation = self.evaluate_board()
-            self.transposition_table[board_hash] = {"evaluation": evaluation, "best_move": None, "depth": depth}
-            return evaluation, None
-        legal_moves = self.order_moves(self.get_all_legal_moves())
-        if not legal_moves:
-            evaluation = self.evaluate_board()
-            return evaluation, None
-        best_move = None
-    
-        if maximizing_player:
-            max_eval = -math.inf
-            for move in legal_moves:
-                piece, start_pos, end_pos = move
-                captured_piece = board.representation.get(end_pos)
-                self.execute_move(piece, start_pos, end_pos)
-                eval, _ = self.minimax(board, depth - 1, alpha, beta, False)
-                self.undo_move(piece, start_pos, end_pos, captured_piece)
-    
-                if eval > max_eval:
-                    max_eval = eval
-                    best_move = move
-                alpha = max(alpha, eval)
-                if beta <= alpha:
-                    break
-            self.transposition_table[board_hash] = {"evaluation": max_eval, "best_move": best_move, "depth": depth}
-            return max_eval, best_move
-    
+        # Cut-off values are only bounds on the true score; storing them as
+        # exact would hand wrong values to later probes with other windows.
+        if best_score <= original_alpha:
+            bound = UPPER
+        elif best_score >= beta:
+            bound = LOWER
         else:
-            min_eval = math.inf
-            for move in legal_moves:
-                piece, start_pos, end_pos = move
-                captured_piece = board.representation.get(end_pos)
-                self.execute_move(piece, start_pos, end_pos)
-                eval, _ = self.minimax(board, depth - 1, alpha, beta, True)
-                self.undo_move(piece, start_pos, end_pos, captured_piece)
-    
-                if eval < min_eval:
-                    min_eval = eval
-                    best_move = move
-                beta = min(beta, eval)
-                if beta <= alpha:
-                    break
-                
-            self.transposition_table[board_hash] = {"evaluation": min_eval, "best_move": best_move, "depth": depth}
-            return min_eval, best_move
-
-
-    def undo_move(self, piece: Piece, start_pos, end_pos, captured_piece):
-        self.board.representation[start_pos] = piece
-        if captured_piece:
-            self.board.representation[end_pos] = captured_piece
+            bound = EXACT
+        self.transposition_table.store(board_hash, depth, score_to_tt(best_score, ply), bound, best_move)
+        return best_score
+
+    def search_move(self, depth, alpha, beta, ply):
+        # Principal variation search: after the first move, a null window
+        # only proves the move is no better than alpha; the few that beat it
+        # are searched again with the full window.
+        if not self.principal_variation_search or beta - alpha <= 1:
+            return -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+        score = -self.negamax(depth - 1, -alpha - 1, -alpha, ply + 1)
+        if alpha < score < beta:
+            score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+        return score
+
+    def quiescence(self, alpha, beta, ply):
+        # Resolve captures (and promotions) at the horizon so leaves are not
+        # scored in the middle of an exchange. In check every evasion is
+        # searched and standing pat is not allowed.
+        self.nodes += 1
+        self.check_limits()
+        self.pv_table[ply] = []
+        # Long check sequences could otherwise run past the per-ply tables.
+        if ply >= MAX_PLY - 1:
+            return self.evaluate()
+        position = self.position
+        board = position.board
+        checked = in_check(position)
+        if checked:
+            moves = self.get_all_legal_moves()
+            if not moves:
+                return -MATE_SCORE + ply
+            best_score = -INFINITY
         else:
-            del self.board.representation[end_pos]
-        piece.decrement_num_of_moves()
\ No newline at end of file
+            best_score = self.evaluate()
+            if best_score >= beta:
+                return best_score
+            if best_score > alpha:
+                alpha = best_score
+            moves = legal_moves(position, captures_only=True)
+        for move in self.order_moves(moves, ply):
+            # Captures that lose material once the square is fully resolved
+            # cannot raise a stand-pat score, so they are not searched.
+            if (not checked and not (move >> 12) & 7
+                    and SEE_VALUES[board[(move >> 6) & 63] & 7] < SEE_VALUES[board[move & 63] & 7]
+                    and static_exchange(position, move) < 0):
+                continue
+            self.execute_move(move)
+            score = -self.quiescence(-beta, -alpha, ply + 1)
+            self.undo_move()
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best_score
+
+    def has_non_pawn_material(self, color):
+        bitboards = self.position.bitboards
+        return any(bitboards[color << 3 | kind] for kind in (KNIGHT, BISHOP, ROOK, QUEEN))
+
+    def undo_move(self):
+        self.position.unmake_move()
@@ -0,0 +1,162 @@
+from game.piece import PieceType, KNIGHT, BISHOP, ROOK, QUEEN
+
+PIECE_VALUES = {
+    PieceType.PAWN: 100,
+    PieceType.KNIGHT: 320,
+    PieceType.BISHOP: 330,
+    PieceType.ROOK: 500,
+    PieceType.QUEEN: 900,
+    PieceType.KING: 0
+}
+
+ENDGAME_PIECE_VALUES = {
+    PieceType.PAWN: 120,
+    PieceType.KNIGHT: 300,
+    PieceType.BISHOP: 320,
+    PieceType.ROOK: 520,
+    PieceType.QUEEN: 940,
+    PieceType.KING: 0
+}
+
+# Tables are written from white's point of view, row 0 being black's back
+# rank; black pieces read them mirrored vertically.
+PIECE_SQUARE_TABLES = {
+    PieceType.PAWN: [
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [50, 50, 50, 50, 50, 50, 50, 50],
+        [10, 10, 20, 30, 30, 20, 10, 10],
+        [5, 5, 10, 25, 25, 10, 5, 5],
+        [0, 0, 0, 20, 20, 0, 0, 0],
+        [5, -5, -10, 0, 0, -10, -5, 5],
+        [5, 10, 10, -20, -20, 10, 10, 5],
+        [0, 0, 0, 0, 0, 0, 0, 0]
+    ],
+    PieceType.KNIGHT: [
+        [-50, -40, -30, -30, -30, -30, -40, -50],
+        [-40, -20, 0, 5, 5, 0, -20, -40],
+        [-30, 5, 10, 15, 15, 10, 5, -30],
+        [-30, 0, 15, 20, 20, 15, 0, -30],
+        [-30, 5, 15, 20, 20, 15, 5, -30],
+        [-30, 0, 10, 15, 15, 10, 0, -30],
+        [-40, -20, 0, 0, 0, 0, -20, -40],
+        [-50, -40, -30, -30, -30, -30, -40, -50]
+    ],
+    PieceType.BISHOP: [
+        [-20, -10, -10, -10, -10, -10, -10, -20],
+        [-10, 0, 0, 0, 0, 0, 0, -10],
+        [-10, 0, 5, 10, 10, 5, 0, -10],
+        [-10, 5, 5, 10, 10, 5, 5, -10],
+        [-10, 0, 10, 10, 10, 10, 0, -10],
+        [-10, 10, 10, 10, 10, 10, 10, -10],
+        [-10, 5, 0, 0, 0, 0, 5, -10],
+        [-20, -10, -10, -10, -10, -10, -10, -20]
+    ],
+    PieceType.ROOK: [
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [5, 10, 10, 10, 10, 10, 10, 5],
+        [-5, 0, 0, 0, 0, 0, 0, -5],
+        [-5, 0, 0, 0, 0, 0, 0, -5],
+        [-5, 0, 0, 0, 0, 0, 0, -5],
+        [-5, 0, 0, 0, 0, 0, 0, -5],
+        [-5, 0, 0, 0, 0, 0, 0, -5],
+        [0, 0, 0, 5, 5, 0, 0, 0]
+    ],
+    PieceType.QUEEN: [
+        [-20, -10, -10, -5, -5, -10, -10, -20],
+        [-10, 0, 0, 0, 0, 0, 0, -10],
+        [-10, 0, 5, 5, 5, 5, 0, -10],
+        [-5, 0, 5, 5, 5, 5, 0, -5],
+        [0, 0, 5, 5, 5, 5, 0, -5],
+        [-10, 5, 5, 5, 5, 5, 0, -10],
+        [-10, 0, 5, 0, 0, 0, 0, -10],
+        [-20, -10, -10, -5, -5, -10, -10, -20]
+    ],
+    PieceType.KING: [
+        [-30, -40, -40, -50, -50, -40, -40, -30],
+        [-30, -40, -40, -50, -50, -40, -40, -30],
+        [-30, -40, -40, -50, -50, -40, -40, -30],
+        [-30, -40, -40, -50, -50, -40, -40, -30],
+        [-20, -30, -30, -40, -40, -30, -30, -20],
+        [-10, -20, -20, -20, -20, -20, -20, -10],
+        [20, 20, 0, 0, 0, 0, 20, 20],
+        [20, 30, 10, 0, 0, 10, 30, 20]
+    ]
+}
+
+ENDGAME_PIECE_SQUARE_TABLES = dict(PIECE_SQUARE_TABLES)
+ENDGAME_PIECE_SQUARE_TABLES.update({
+    PieceType.PAWN: [
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [80, 80, 80, 80, 80, 80, 80, 80],
+        [50, 50, 50, 50, 50, 50, 50, 50],
+        [30, 30, 30, 30, 30, 30, 30, 30],
+        [20, 20, 20, 20, 20, 20, 20, 20],
+        [10, 10, 10, 10, 10, 10, 10, 10],
+        [10, 10, 10, 10, 10, 10, 10, 10],
+        [0, 0, 0, 0, 0, 0, 0, 0]
+    ],
+    PieceType.KING: [
+        [-50, -40, -30, -20, -20, -30, -40, -50],
+        [-30, -20, -10, 0, 0, -10, -20, -30],
+        [-30, -10, 20, 30, 30, 20, -10, -30],
+        [-30, -10, 30, 40, 40, 30, -10, -30],
+        [-30, -10, 30, 40, 40, 30, -10, -30],
+        [-30, -10, 20, 30, 30, 20, -10, -30],
+        [-30, -30, 0, 0, 0, 0, -30, -30],
+        [-50, -30, -30, -30, -30, -30, -30, -50]
+    ]
+})
+
+# Game phase runs from TOTAL_PHASE (all minor and major pieces on the board)
+# down to 0 (bare kings and pawns) and blends the two score sets.
+PHASE_WEIGHTS = [0, 0, 1, 1, 2, 4, 0, 0] * 2
+TOTAL_PHASE = 24
+
+def _square_scores(values, tables):
+    # Material plus piece-square bonus for every piece code on every square,
+    # signed from white's point of view.
+    scores = [[0] * 64 for _ in range(15)]
+    for piece_type in PieceType:
+        table = tables[piece_type]
+        for sq in range(64):
+            row, col = sq >> 3, sq & 7
+            scores[piece_type][sq] = values[piece_type] + table[row][col]
+            scores[piece_type | 8][sq] = -(values[piece_type] + table[7 - row][col])
+    return scores
+
+MIDDLEGAME_SCORES = _square_scores(PIECE_VALUES, PIECE_SQUARE_TABLES)
+ENDGAME_SCORES = _square_scores(ENDGAME_PIECE_VALUES, ENDGAME_PIECE_SQUARE_TABLES)
+
+def eval_terms(board):
+    middlegame = endgame = phase = 0
+    for sq, piece in enumerate(board):
+        if piece:
+            middlegame += MIDDLEGAME_SCORES[piece][sq]
+            endgame += ENDGAME_SCORES[piece][sq]
+            phase += PHASE_WEIGHTS[piece]
+    return middlegame, endgame, phase
+
+def taper(middlegame, endgame, phase):
+    phase = min(phase, TOTAL_PHASE)
+    return (middlegame * phase + endgame * (TOTAL_PHASE - phase)) // TOTAL_PHASE
+
+def evaluate(position):
+    # O(1): blends the running totals that make/unmake keep up to date.
+    return taper(position.mg_score, position.eg_score, position.phase)
+
+def evaluate_reference(position):
+    # Slow path straight from the tables, used to check the running totals.
+    middlegame = endgame = phase = 0
+    for sq, piece in enumerate(position.board):
+        if not piece:
+            continue
+        piece_type = PieceType(piece & 7)
+        row, col = sq >> 3, sq & 7
+        if piece >> 3:
+            row = 7 - row
+        sign = -1 if piece >> 3 else 1
+        middlegame += sign * (PIECE_VALUES[piece_type] + PIECE_SQUARE_TABLES[piece_type][row][col])
+        endgame += sign * (ENDGAME_PIECE_VALUES[piece_type] + ENDGAME_PIECE_SQUARE_TABLES[piece_type][row][col])
+        if piece_type in (KNIGHT, BISHOP, ROOK, QUEEN):
+            phase += {KNIGHT: 1, BISHOP: 1, ROOK: 2, QUEEN: 4}[piece_type]
+    return taper(middlegame, endgame, phase)
@@ -1,13 +1,35 @@
-from collections import defaultdict
+import os
 import pygame
 from game.board import Board
 from utils.gameobject import GameObject
 import globals
-from game.piece import PieceType, PieceColor
+from game.piece import PieceType, PieceColor, asset_name, make_piece
+from game.move import NO_MOVE, NO_SQUARE, square, move_to, move_promotion
 from utils.image import load_image
-from game.piece import Piece
 from game.engine import Engine
-from utils.zobrist import Zobrist
+from game.search_worker import SearchWorker
+from game.book import OpeningBook
+from game.tablebase import Tablebases
+from game.status import GameStatus
+
+BOOK_PATH = "assets/book.bin"
+TABLEBASE_PATH = "tablebases"
+
+# Per-move budget used once pondering is switched on with the P key; a
+# ponder hit needs a clock to switch to.
+PONDER_MOVE_TIME = 2.0
+
+# Frame cap while something is happening, and the lower rate used when a
+# frame had no input and nothing to redraw (e.g. waiting for the engine).
+FPS = 60
+IDLE_FPS = 10
+
+DRAW_MESSAGES = {
+    "stalemate": "Draw by Stalemate",
+    "repetition": "Draw by Repetition",
+    "fifty moves": "Draw by Fifty-Move Rule",
+    "insufficient material": "Draw by Insufficient Material",
+}
 
 class Game(GameObject):
     _instance = None
@@ -22,32 +44,44 @@ class Game(GameObject):
             self.screen = screen
             self.square_size = square_size
             self.board = Board(columns=8, rows=8, light_cell_color=(232,237,249), dark_cell_color=(183,192,216), square_size=square_size, screen=screen)
+            self.position = self.board.position
             self.selected_piece = None
             self.selected_coord = None
             self.dragging = False
             self.legal_moves = None
+            self.candidate_moves = None
             self.initialized = True
             self.current_turn: PieceColor = PieceColor.WHITE
             self.player_turn: PieceColor = PieceColor.WHITE
             self.ai_turn: PieceColor = PieceColor.BLACK
             if self.player_turn == PieceColor.BLACK:
                 self.ai_turn = PieceColor.WHITE
-            self.engine = Engine(self.board, self.ai_turn)
+            self.book = OpeningBook(BOOK_PATH) if os.path.exists(BOOK_PATH) else None
+            self.tablebases = Tablebases(TABLEBASE_PATH) if os.path.isdir(TABLEBASE_PATH) else None
+            self.engine = Engine(self.position, self.ai_turn, book=self.book, tablebases=self.tablebases)
+            self.search_worker = SearchWorker(self.engine)
+            self.search_handle = None
+            self.last_move = NO_MOVE
+            # Pondering needs a per-move time budget to switch to on a hit.
+            self.ai_move_time = None
+            self.pondering = False
             self.game_end = False
-            self.zobrist = Zobrist(self.board)
-            self.history = []
-            self.repetition_count = defaultdict(int)
+            # Refreshed by change_turn after every move; the frame loop and
+            # input handlers only read it.
+            self.status = GameStatus(self.position)
+            self.fps = FPS
+            self.idle_fps = IDLE_FPS
             globals.game_instance = self
     
     def update(self):
-        if self.is_draw_by_repetition():
-            self.display_draw("Draw by Repetition")
+        if self.status.checkmate:
             self.game_end = True
+            self.display_victory(self.current_turn)
             return
 
-        if self.is_draw_by_stalemate():
-            self.display_draw("Draw by Stalemate")
+        if self.status.over:
             self.game_end = True
+            self.display_draw(DRAW_MESSAGES[self.status.termination])
             return
         return self.board.update()
 
@@ -59,42 +93,6 @@ class Game(GameObject):
         pygame.time.wait(3000)
         exit()
     
-    def is_draw_by_repetition(self):
-        board_hash = self.zobrist.compute_hash()
-        return self.repetition_count[board_hash] >= 3
-
-    def is_draw_by_stalemate(self):
-        return not self.is_checkmate(self.current_turn) and not self.has_valid_moves(self.current_turn)
-
-    def is_checkmate(self, color: PieceColor):
-        opponent_color = PieceColor.WHITE if color == PieceColor.BLACK else PieceColor.BLACK
-        opponent_king_pos = self.get_king_position(opponent_color)
-
-        if self.is_king_in_check(opponent_king_pos, opponent_color):
-            if not self.has_valid_moves(opponent_color):
-                return True
-        return False
-
-    def is_king_in_check(self, king_pos, color: PieceColor):
-        opponent_color = PieceColor.WHITE if color == PieceColor.BLACK else PieceColor.BLACK
-        threat_coords = self.board.generate_threat_map(opponent_color, self.board.representation)
-        return king_pos in threat_coords
-
-    def get_king_position(self, color: PieceColor):
-        for coord, piece in self.board.representation.items():
-            if piece.name == PieceType.KING and piece.color == color:
-                return coord
-        return None
-    
-    def has_valid_moves(self, color: PieceColor):
-        for coord, piece in self.board.representation.items():
-            if piece.color == color:
-                legal_moves = piece.get_legal_moves(coord, self.board.representation)
-                for move in legal_moves:
-                    if not self.king_will_be_in_danger(self.board.representation, coord, piece, move, color):
-                        return True
-        return False
-
     def display_victory(self, color: PieceColor):
         winner = "White" if color == PieceColor.BLACK else "Black"
         font = pygame.font.SysFont("Arial", 30)
@@ -106,155 +104,142 @@ class Game(GameObject):
 
     def run(self):
         run = True
-        ai_waiting = False  
-        ai_wait_frames = 10  
-        ai_wait_counter = 0
+        clock = pygame.time.Clock()
+        drag_rect = None
 
         while run:
-            self.update()
+            # Only squares that changed (or that the dragged piece covered
+            # last frame) are redrawn and pushed to the display.
+            if drag_rect is not None:
+                self.board.invalidate(drag_rect)
+                drag_rect = None
+            rects = self.update() or []
 
             if self.dragging:
-                self.handle_piece_drag()
+                drag_rect = self.handle_piece_drag()
+                if drag_rect is not None:
+                    rects.append(drag_rect)
 
             if not self.game_end and self.current_turn == self.ai_turn and not self.dragging:
-                if ai_waiting:  
-                    ai_wait_counter += 1
-                    if ai_wait_counter >= ai_wait_frames:
-                        self.engine.make_move()  
-                        self.change_turn()
-                        ai_waiting = False  
-                        ai_wait_counter = 0  
-                else:
-                    ai_waiting = True  
+                self.update_engine_search()
 
-            for event in pygame.event.get():
+            events = pygame.event.get()
+            for event in events:
                 if event.type == pygame.QUIT:
                     run = False
                 elif event.type == pygame.MOUSEBUTTONDOWN:
                     self.handle_mouse_down(event.pos)
                 elif event.type == pygame.MOUSEBUTTONUP:
                     self.handle_mouse_up(event.pos)
-            pygame.display.update()
-
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_p:
+                    self.toggle_pondering()
+                elif event.type == pygame.VIDEOEXPOSE:
+                    self.board.invalidate()
+            if rects:
+                pygame.display.update(rects)
+            clock.tick(self.fps if rects or events or self.dragging else self.idle_fps)
+
+        self.search_worker.cancel()
+        if self.book is not None:
+            self.book.close()
+        if self.tablebases is not None:
+            self.tablebases.close()
         pygame.quit()
 
+    def update_engine_search(self):
+        # The search runs on the worker thread; the frame loop only starts it
+        # and picks up the move once the handle reports it is done.
+        if self.search_handle is None:
+            handle = self.search_worker.handle
+            if handle is not None and handle.ponder_move is not None and handle.ponder_move == self.last_move:
+                handle.ponderhit(self.ai_move_time)
+                self.search_handle = handle
+            else:
+                self.search_handle = self.search_worker.start(self.position, time_limit=self.ai_move_time)
+            return
+        if not self.search_handle.done():
+            return
+        result = self.search_handle.result()
+        self.search_handle = None
+        if result is None or not result.best_move:
+            return
+        self.position.make_move(result.best_move)
+        self.last_move = result.best_move
+        self.change_turn()
+        if self.pondering and self.ai_move_time:
+            self.start_pondering(result)
+
+    def toggle_pondering(self):
+        self.pondering = not self.pondering
+        if self.pondering:
+            self.ai_move_time = self.ai_move_time or PONDER_MOVE_TIME
+        elif self.search_handle is None:
+            # Drop a ponder search still running on the player's time.
+            self.search_worker.cancel()
+        pygame.display.set_caption(f"PyChess (pondering {'on' if self.pondering else 'off'})")
+
+    def start_pondering(self, result):
+        # Ponder on the reply the search expects, from its PV or else the TT.
+        if len(result.pv) > 1:
+            ponder_move = result.pv[1]
+        else:
+            entry = self.engine.transposition_table.probe(self.position.key)
+            ponder_move = entry[3] if entry is not None else NO_MOVE
+        if ponder_move and ponder_move in self.status.moves:
+            self.search_worker.ponder(self.position, ponder_move)
 
     def handle_mouse_down(self, pos):
         col, row = pos[0] // self.square_size, pos[1] // self.square_size
         self.selected_coord = (col, row)
-        self.selected_piece = self.board.get_piece_obj_on_pos(self.selected_coord)
-        if self.selected_piece and self.selected_piece.color == self.current_turn and self.current_turn == self.player_turn:
-            legal_moves_cadiates = self.selected_piece.get_legal_moves(self.selected_coord, self.board.representation)
-            self.legal_moves = []
-            castling_legal = []
-            for legal_move in legal_moves_cadiates:
-                if not self.king_will_be_in_danger(self.board.representation, self.selected_coord, self.selected_piece, legal_move, self.current_turn):
-                    self.legal_moves.append(legal_move)
-            if self.selected_piece == PieceType.KING:
-                for lm in self.legal_moves:
-                    current_col, _ = self.selected_coord
-                    lm_col, _ = lm
-                    offset = lm_col - current_col
-                    if offset > 1 or offset < -1:
-                        castling_legal.append(lm)
-                self.legal_moves = castling_legal
-            # del[self.board.representation[self.selected_coord]]
-            self.selected_piece.showing = False
+        selected_square = square(col, row)
+        self.selected_piece = self.board.get_piece_on_square(selected_square)
+        if self.selected_piece and self.selected_piece >> 3 == self.current_turn and self.current_turn == self.player_turn:
+            self.candidate_moves = self.status.moves_from(selected_square)
+            self.legal_moves = [(move_to(move) & 7, move_to(move) >> 3) for move in self.candidate_moves]
+            self.board.hidden_square = selected_square
             self.dragging = True
+        else:
+            self.selected_piece = None
 
     def handle_mouse_up(self, pos):
         if self.dragging:
             col, row = pos[0] // self.square_size, pos[1] // self.square_size
-            col_selected, row_selected = self.selected_coord
-            if self.legal_moves is not None:
-                if (col, row) in self.legal_moves:
-                    if self.selected_piece.name == PieceType.KING:
-                        offset = col - col_selected
-                        if offset == 2:
-                            self.board.representation[(col - 1, row)] = self.board.representation[(col + 1, row)]
-                            del[self.board.representation[(col + 1, row)]]
-                        elif offset == -2:
-                            self.board.representation[(col + 1, row)] = self.board.representation[(col - 2, row)]
-                            del[self.board.representation[(col - 2, row)]]
-                    if self.selected_piece.name == PieceType.PAWN:
-                        piece_at_target = self.board.representation.get((col, row), None)
-                        if piece_at_target is None:
-                            offset = (col_selected - col, row_selected - row)
-                            increment = 1 if self.selected_piece.color == PieceColor.WHITE else -1
-                            offsets = [-1, 1]
-                            for os in offsets:
-                                if offset == (os, increment):
-                                    del[self.board.representation[(col_selected - os, row_selected)]]  
-                    
-                    self.board.representation[(col, row)] = self.selected_piece
-                    del[self.board.representation[self.selected_coord]]
-                    self.selected_piece.showing = True
-                    if (self.selected_piece.name == PieceType.PAWN and self.selected_piece.color == PieceColor.WHITE and row == 0) or \
-                       (self.selected_piece.name == PieceType.PAWN and self.selected_piece.color == PieceColor.BLACK and row == 7):
-                        self.show_promotion_ui((col, row))
-                    if self.is_checkmate(self.current_turn):
-                        self.game_end = True
-                        victory = PieceColor.WHITE if self.current_turn == PieceColor.BLACK else PieceColor.BLACK
-                        self.display_victory(victory)
-                    
-                    if self.selected_piece:
-                        self.selected_piece.increment_num_of_moves()  
-                    self.change_turn()
-                    
-                else:
-                    self.board.representation[self.selected_coord] = self.selected_piece
-                    self.selected_piece.showing = True
+            if self.legal_moves is not None and (col, row) in self.legal_moves:
+                target = square(col, row)
+                moves = [move for move in self.candidate_moves if move_to(move) == target]
+                if len(moves) > 1:
+                    promotion = self.show_promotion_ui((col, row))
+                    moves = [move for move in moves if move_promotion(move) == promotion]
+                self.position.make_move(moves[0])
+                self.last_move = moves[0]
+                self.change_turn()
+                if self.status.checkmate:
+                    self.game_end = True
+                    self.display_victory(self.current_turn)
+            self.board.hidden_square = NO_SQUARE
             self.dragging = False
             self.selected_piece = None
             self.legal_moves = None
+            self.candidate_moves = None
     
     def change_turn(self):
-        if self.current_turn == PieceColor.WHITE:
-            self.current_turn = PieceColor.BLACK
-        else:
-            self.current_turn = PieceColor.WHITE
-        current_hash = self.zobrist.compute_hash()
-        self.history.append(current_hash)
-        self.repetition_count[current_hash] += 1
-
-    def king_will_be_in_danger(self, representation, selected_coord, selected_piece, target_coord, turn):
-        clone_representation = representation.copy()
-        col, row = target_coord
-
-        if selected_coord in clone_representation:
-            del clone_representation[selected_coord]
-        clone_representation[(col, row)] = selected_piece
-
-        king_position = None
-        for coord, piece in clone_representation.items():
-            if piece.name == PieceType.KING and piece.color == turn:
-                king_position = coord
-                break
-
-        if not king_position:
-            raise ValueError("King not found on the board")
-
-        opponent = PieceColor.WHITE if turn == PieceColor.BLACK else PieceColor.BLACK
-        threat_coords = self.board.generate_threat_map(opponent, clone_representation)
-
-        if king_position in threat_coords:
-            return True
-        return False
+        self.current_turn = PieceColor(self.position.turn)
+        self.status = GameStatus(self.position)
 
     def handle_piece_drag(self):
          if self.selected_piece is not None:
             mouse_x, mouse_y = pygame.mouse.get_pos()
-            piece_image = self.selected_piece.image
+            piece_image = self.board.piece_images[self.selected_piece]
             piece_rect = piece_image.get_rect()
             piece_rect.topleft = (mouse_x - piece_rect.width // 2, mouse_y - piece_rect.height // 2)
             self.screen.blit(piece_image, piece_rect.topleft)
+            return piece_rect
     
     def show_promotion_ui(self, target_coord):
+        color = self.selected_piece >> 3
         piece_options = [
-            (PieceType.QUEEN, load_image(f"assets/{self.selected_piece.color.value}_queen.png", 80, 80)),
-            (PieceType.ROOK, load_image(f"assets/{self.selected_piece.color.value}_rook.png", 80, 80)),
-            (PieceType.BISHOP, load_image(f"assets/{self.selected_piece.color.value}_bishop.png", 80, 80)),
-            (PieceType.KNIGHT, load_image(f"assets/{self.selected_piece.color.value}_knight.png", 80, 80)),
+            (piece_type, load_image(f"assets/{asset_name(make_piece(color, piece_type))}.png", 80, 80))
+            for piece_type in (PieceType.QUEEN, PieceType.ROOK, PieceType.BISHOP, PieceType.KNIGHT)
         ]
 
         box_width, box_height = 320, 80
@@ -275,8 +260,7 @@ class Game(GameObject):
 
         pygame.display.update()
 
-        selecting = True
-        while selecting:
+        while True:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     pygame.quit()
@@ -287,12 +271,6 @@ class Game(GameObject):
                         button_x = box_x + i * 80
                         button_y = box_y
                         if button_x <= mouse_x <= button_x + 80 and button_y <= mouse_y <= button_y + 80:
-                            self.promote_pawn(target_coord, piece_type)
-                            selecting = False
-                            break
-                        
-    def promote_pawn(self, target_coord, new_piece_type):
-        new_piece = Piece(self.selected_piece.color, new_piece_type, self.square_size, self.square_size)
-        self.board.representation[target_coord] = new_piece
-        self.selected_piece = None
-        self.legal_moves = None
\ No newline at end of file
+                            # The dialog was drawn over the board.
+                            self.board.invalidate()
+                            return piece_type
@@ -0,0 +1,398 @@
+import argparse
+import json
+import math
+import multiprocessing
+import random
+import sys
+import time
+from datetime import date
+from game.position import Position, STARTING_FEN
+from game.engine import Engine
+from game.movegen import legal_moves
+from game.status import GameStatus
+from game.move import move_to_uci
+from game.notation import move_to_san
+from game.piece import WHITE
+from game.uci import allocate_time
+
+# Engine settings understood by the runner; any other key is set as an
+# attribute on the Engine, so search switches can be A/B tested by name.
+ENGINE_KEYS = ("name", "depth", "nodes", "movetime", "tc", "hash")
+
+ADJUDICATION = {
+    "resign_score": 1000,
+    "resign_moves": 3,
+    "draw_score": 10,
+    "draw_moves": 8,
+    "draw_move_number": 40,
+    "max_moves": 200,
+}
+
+_engines = {}
+
+def parse_value(text):
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    if text.lower() in ("true", "false", "on", "off"):
+        return text.lower() in ("true", "on")
+    return text
+
+def parse_engine(tokens):
+    config = {"name": None, "hash": 16}
+    for token in tokens:
+        key, _, value = token.partition("=")
+        config[key] = value if key in ("name", "tc") else parse_value(value)
+    if not any(config.get(key) for key in ("depth", "nodes", "movetime", "tc")):
+        config["depth"] = 3
+    if config["name"] is None:
+        config["name"] = " ".join(tokens) or "engine"
+    return config
+
+def load_openings(path):
+    # FEN or EPD lines; EPD operations after the four position fields are ignored.
+    openings = []
+    with open(path) as handle:
+        for line in handle:
+            fields = line.split(";")[0].split()
+            if len(fields) < 4:
+                continue
+            if len(fields) < 6 or not fields[4].isdigit():
+                fields = fields[:4] + ["0", "1"]
+            openings.append(" ".join(fields[:6]))
+    return openings
+
+def random_openings(count, plies, seed=0):
+    rng = random.Random(seed)
+    openings = []
+    while len(openings) < count:
+        position = Position.from_fen(STARTING_FEN)
+        for _ in range(plies):
+            moves = legal_moves(position)
+            if not moves:
+                break
+            position.make_move(rng.choice(moves))
+        if legal_moves(position):
+            openings.append(position.to_fen())
+    return openings
+
+def get_engine(config):
+    engine = _engines.get(config["name"])
+    if engine is None:
+        engine = Engine(Position(), None, hash_size_mb=config["hash"])
+        for key, value in config.items():
+            if key not in ENGINE_KEYS:
+                if not hasattr(engine, key):
+                    raise ValueError(f"Unknown engine option {key}")
+                setattr(engine, key, value)
+        _engines[config["name"]] = engine
+    return engine
+
+def parse_time_control(text):
+    base, _, increment = text.partition("+")
+    return float(base) * 1000, float(increment or 0) * 1000
+
+def play_game(job):
+    index, fen, white, black, adjudication = job
+    position = Position.from_fen(fen)
+    configs = (white, black)
+    engines = (get_engine(white), get_engine(black))
+    for engine in engines:
+        engine.transposition_table.clear()
+    clocks = [None, None]
+    increments = [0, 0]
+    for color, config in enumerate(configs):
+        if config.get("tc"):
+            clocks[color], increments[color] = parse_time_control(config["tc"])
+    start_position = position.copy()
+    moves = []
+    scores = []
+    result, termination = None, None
+    while result is None:
+        status = GameStatus(position)
+        if status.over:
+            result, termination = status.result, status.termination
+            break
+        if len(moves) >= 2 * adjudication["max_moves"]:
+            result, termination = "1/2-1/2", "max moves"
+            break
+
+        turn = position.turn
+        config = configs[turn]
+        engine = engines[turn]
+        time_limit = config["movetime"] / 1000 if config.get("movetime") else None
+        if clocks[turn] is not None:
+            limits = {"wtime": clocks[WHITE], "btime": clocks[WHITE ^ 1], "winc": increments[WHITE],
+                      "binc": increments[WHITE ^ 1]}
+            time_limit = allocate_time(limits, turn)
+        engine.position = position
+        engine.ai_color = turn
+        search = engine.search(depth=config.get("depth"), nodes=config.get("nodes"), time_limit=time_limit)
+        if clocks[turn] is not None:
+            clocks[turn] -= search.elapsed * 1000
+            if clocks[turn] < 0:
+                result, termination = ("0-1" if turn == WHITE else "1-0"), "time forfeit"
+                break
+            clocks[turn] += increments[turn]
+        moves.append(search.best_move)
+        scores.append(search.score if turn == WHITE else -search.score)
+        position.make_move(search.best_move)
+        result, termination = adjudicate(scores, position, adjudication)
+
+    san_moves = []
+    for move in moves:
+        san_moves.append(move_to_san(start_position, move))
+        start_position.make_move(move)
+    return {
+        "index": index,
+        "white": white["name"],
+        "black": black["name"],
+        "fen": fen,
+        "result": result,
+        "termination": termination,
+        "moves": [move_to_uci(move) for move in moves],
+        "san": san_moves,
+        "plies": len(moves),
+    }
+
+def adjudicate(scores, position, adjudication):
+    # Scores are from white's point of view, one per ply. A resignation needs
+    # both engines to agree on the outcome for the last few moves each.
+    plies = 2 * adjudication["resign_moves"]
+    if adjudication["resign_score"] and len(scores) >= plies:
+        recent = scores[-plies:]
+        if all(score >= adjudication["resign_score"] for score in recent):
+            return "1-0", "adjudication"
+        if all(score <= -adjudication["resign_score"] for score in recent):
+            return "0-1", "adjudication"
+    plies = 2 * adjudication["draw_moves"]
+    if (adjudication["draw_moves"] and position.fullmove_number >= adjudication["draw_move_number"]
+            and len(scores) >= plies and all(abs(score) <= adjudication["draw_score"] for score in scores[-plies:])):
+        return "1/2-1/2", "adjudication"
+    return None, None
+
+def game_jobs(games, openings, first, second, adjudication):
+    # Each opening is played twice with colours reversed so neither engine
+    # profits from a lopsided start.
+    for index in range(games):
+        fen = openings[(index // 2) % len(openings)]
+        if index % 2 == 0:
+            yield index, fen, first, second, adjudication
+        else:
+            yield index, fen, second, first, adjudication
+
+def to_pgn(record, round_number):
+    headers = [
+        ("Event", "Engine match"),
+        ("Site", "?"),
+        ("Date", date.today().strftime("%Y.%m.%d")),
+        ("Round", str(round_number)),
+        ("White", record["white"]),
+        ("Black", record["black"]),
+        ("Result", record["result"]),
+    ]
+    if record["fen"] != STARTING_FEN:
+        headers += [("SetUp", "1"), ("FEN", record["fen"])]
+    headers += [("Termination", record["termination"]), ("PlyCount", str(record["plies"]))]
+    lines = [f'[{name} "{value}"]' for name, value in headers]
+    fields = record["fen"].split()
+    move_number = int(fields[5])
+    black_first = fields[1] == "b"
+    tokens = []
+    for ply, san in enumerate(record["san"]):
+        if ply == 0 and black_first:
+            tokens.append(f"{move_number}...")
+        elif (ply + black_first) % 2 == 0:
+            tokens.append(f"{move_number}.")
+        tokens.append(san)
+        if (ply + black_first) % 2 == 1:
+            move_number += 1
+    tokens.append(record["result"])
+    text, line = [], ""
+    for token in tokens:
+        if line and len(line) + len(token) + 1 > 79:
+            text.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    text.append(line)
+    return "\n".join(lines) + "\n\n" + "\n".join(text) + "\n\n"
+
+class MatchStats:
+    # Win/draw/loss counts from the first engine's point of view.
+    def __init__(self):
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+
+    @property
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    def add(self, record, first_name):
+        if record["result"] == "1/2-1/2":
+            self.draws += 1
+        elif (record["result"] == "1-0") == (record["white"] == first_name):
+            self.wins += 1
+        else:
+            self.losses += 1
+
+    def score(self):
+        return (self.wins + self.draws / 2) / self.games if self.games else 0.5
+
+    def variance(self):
+        # Per-game variance of the score, from the observed W/D/L frequencies.
+        if not self.games:
+            return 0.0
+        score = self.score()
+        return (self.wins * (1 - score) ** 2 + self.draws * (0.5 - score) ** 2
+                + self.losses * score ** 2) / self.games
+
+    @property
+    def estimable(self):
+        # Elo and LOS are infinite or undefined until both sides have won a
+        # game.
+        return self.wins > 0 and self.losses > 0
+
+    def elo(self):
+        # (elo difference, 95% error margin), or (None, None) until estimable.
+        if not self.estimable:
+            return None, None
+        score = self.score()
+        margin = 1.959964 * math.sqrt(self.variance() / self.games)
+        difference = score_to_elo(score)
+        # Keep the interval ends off 0 and 1, where the Elo scale is infinite.
+        floor = 1 / (2 * self.games)
+        low = score_to_elo(max(score - margin, floor))
+        high = score_to_elo(min(score + margin, 1 - floor))
+        return difference, (high - low) / 2
+
+    def los(self):
+        if not self.estimable:
+            return None
+        return 0.5 * (1 + math.erf((self.wins - self.losses) / math.sqrt(2 * (self.wins + self.losses))))
+
+    def llr(self, elo0, elo1):
+        # Log-likelihood ratio of H1 (elo1) against H0 (elo0) in the normal
+        # approximation to the trinomial model.
+        variance = self.variance()
+        if not self.games or variance <= 0:
+            return 0.0
+        score0, score1 = elo_to_score(elo0), elo_to_score(elo1)
+        return self.games * (score1 - score0) * (2 * self.score() - score0 - score1) / (2 * variance)
+
+def score_to_elo(score):
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return -400 * math.log10(1 / score - 1)
+
+def elo_to_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+def format_elo(stats):
+    if not stats.estimable:
+        return "elo n/a (needs wins and losses)"
+    difference, margin = stats.elo()
+    return f"elo {difference:+.1f} +/- {margin:.1f}, LOS {100 * stats.los():.1f}%"
+
+def sprt_bounds(alpha, beta):
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+def run_match(first, second, openings, games=100, concurrency=None, adjudication=None, sprt=None, pgn_path=None,
+              jsonl_path=None, out=sys.stdout):
+    # Games are spread over a process pool and written out in the order
+    # they finish; an SPRT decision ends the match early.
+    adjudication = dict(ADJUDICATION, **(adjudication or {}))
+    if first["name"] == second["name"]:
+        second = dict(second, name=second["name"] + " (2)")
+    stats = MatchStats()
+    pgn = open(pgn_path, "a") if pgn_path else None
+    jsonl = open(jsonl_path, "a") if jsonl_path else None
+    decision = None
+    start = time.perf_counter()
+    pool = multiprocessing.Pool(concurrency or multiprocessing.cpu_count())
+    try:
+        for record in pool.imap_unordered(play_game, game_jobs(games, openings, first, second, adjudication)):
+            stats.add(record, first["name"])
+            if pgn is not None:
+                pgn.write(to_pgn(record, record["index"] + 1))
+                pgn.flush()
+            if jsonl is not None:
+                jsonl.write(json.dumps(record) + "\n")
+                jsonl.flush()
+            line = f"game {stats.games}/{games}  +{stats.wins} ={stats.draws} -{stats.losses}  {format_elo(stats)}"
+            if sprt is not None:
+                llr = stats.llr(sprt["elo0"], sprt["elo1"])
+                lower, upper = sprt_bounds(sprt["alpha"], sprt["beta"])
+                line += f"  llr {llr:.2f} [{lower:.2f}, {upper:.2f}]"
+                if llr >= upper:
+                    decision = "H1"
+                elif llr <= lower:
+                    decision = "H0"
+            print(line, file=out, flush=True)
+            if decision is not None:
+                break
+    finally:
+        pool.terminate()
+        pool.join()
+        if pgn is not None:
+            pgn.close()
+        if jsonl is not None:
+            jsonl.close()
+    difference, margin = stats.elo()
+    report = {
+        "first": first["name"],
+        "second": second["name"],
+        "games": stats.games,
+        "wins": stats.wins,
+        "draws": stats.draws,
+        "losses": stats.losses,
+        "elo": difference,
+        "error": margin,
+        "los": stats.los(),
+        "sprt": decision,
+        "elapsed": time.perf_counter() - start,
+    }
+    print(f"{first['name']} vs {second['name']}: {stats.games} games, {format_elo(stats)}"
+          + (f", SPRT accepted {decision}" if decision else ""), file=out)
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play engine-vs-engine games in parallel and estimate the Elo difference.")
+    parser.add_argument("--engine", action="append", nargs="+", required=True, metavar="KEY=VALUE",
+                        help="engine settings: name, depth, nodes, movetime (ms), tc (base+inc seconds), hash, "
+                             "or any Engine attribute; give twice")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--openings", help="FEN/EPD file of start positions")
+    parser.add_argument("--random-plies", type=int, default=4, help="random opening length when no file is given")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pgn", help="append finished games to this PGN file")
+    parser.add_argument("--jsonl", help="append finished games to this JSONL file")
+    parser.add_argument("--sprt", nargs=2, type=float, metavar=("ELO0", "ELO1"), help="stop on an SPRT decision")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    for key, value in ADJUDICATION.items():
+        parser.add_argument("--" + key.replace("_", "-"), type=int, default=value)
+    args = parser.parse_args(argv)
+
+    if len(args.engine) != 2:
+        parser.error("exactly two --engine options are required")
+    first, second = (parse_engine(tokens) for tokens in args.engine)
+    if args.openings:
+        openings = load_openings(args.openings)
+    else:
+        openings = random_openings(max(1, (args.games + 1) // 2), args.random_plies, args.seed)
+    adjudication = {key: getattr(args, key) for key in ADJUDICATION}
+    sprt = None
+    if args.sprt:
+        sprt = {"elo0": args.sprt[0], "elo1": args.sprt[1], "alpha": args.alpha, "beta": args.beta}
+    run_match(first, second, openings, args.games, args.concurrency, adjudication, sprt, args.pgn, args.jsonl)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
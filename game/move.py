@@ -0,0 +1,50 @@
+from game.piece import KNIGHT, BISHOP, ROOK, QUEEN, PIECE_SYMBOLS
+
+# Squares are numbered row * 8 + col with row 0 being black's back rank,
+# matching the (col, row) screen coordinates used by the board.
+# A move packs from (6 bits), to (6 bits), promotion type (3 bits) and a flag.
+NO_MOVE = 0
+NO_SQUARE = -1
+
+FLAG_NONE = 0
+FLAG_DOUBLE_PUSH = 1
+FLAG_EN_PASSANT = 2
+FLAG_CASTLE = 3
+
+PROMOTION_TYPES = (QUEEN, ROOK, BISHOP, KNIGHT)
+
+def square(col, row):
+    return row * 8 + col
+
+def square_coord(sq):
+    return sq & 7, sq >> 3
+
+def square_name(sq):
+    return "abcdefgh"[sq & 7] + str(8 - (sq >> 3))
+
+def parse_square(name):
+    return square("abcdefgh".index(name[0]), 8 - int(name[1]))
+
+def encode_move(from_sq, to_sq, promotion=0, flag=FLAG_NONE):
+    return from_sq | (to_sq << 6) | (promotion << 12) | (flag << 15)
+
+def move_from(move):
+    return move & 63
+
+def move_to(move):
+    return (move >> 6) & 63
+
+def move_promotion(move):
+    return (move >> 12) & 7
+
+def move_flag(move):
+    return move >> 15
+
+def move_to_uci(move):
+    if move == NO_MOVE:
+        return "0000"
+    uci = square_name(move & 63) + square_name((move >> 6) & 63)
+    promotion = (move >> 12) & 7
+    if promotion:
+        uci += PIECE_SYMBOLS[promotion]
+    return uci
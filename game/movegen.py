@@ -0,0 +1,288 @@
+from game.piece import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE
+from game.move import FLAG_DOUBLE_PUSH, FLAG_EN_PASSANT, FLAG_CASTLE, NO_SQUARE, PROMOTION_TYPES, move_to_uci
+from game.evaluation import PIECE_VALUES
+from game.position import Position, WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE
+from game.bitboard import (FULL, FILE_A, FILE_H, ROWS, KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS,
+                           RANK_MASKS, FILE_MASKS, DIAGONAL_MASKS, ANTI_DIAGONAL_MASKS, RANK_ATTACKS,
+                           FILE_ATTACKS, DIAGONAL_ATTACKS, ANTI_DIAGONAL_ATTACKS, BETWEEN, LINE, rook_attacks,
+                           bishop_attacks)
+
+DOUBLE_PUSH_FLAG = FLAG_DOUBLE_PUSH << 15
+EN_PASSANT_FLAG = FLAG_EN_PASSANT << 15
+CASTLE_FLAG = FLAG_CASTLE << 15
+PROMOTION_CODES = [promotion << 12 for promotion in PROMOTION_TYPES]
+
+# Exchange values by piece type; the king only ever captures last.
+SEE_VALUES = [0] + [PIECE_VALUES[kind] for kind in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN)] + [20000]
+
+# Castling: (right, king target, squares that must be empty, squares the king crosses)
+CASTLING_MOVES = [
+    [(WHITE_KINGSIDE, 62, (1 << 61) | (1 << 62), (61, 62)),
+     (WHITE_QUEENSIDE, 58, (1 << 57) | (1 << 58) | (1 << 59), (59, 58))],
+    [(BLACK_KINGSIDE, 6, (1 << 5) | (1 << 6), (5, 6)),
+     (BLACK_QUEENSIDE, 2, (1 << 1) | (1 << 2) | (1 << 3), (3, 2))],
+]
+
+def attackers_to(position: Position, sq, by_color, occupied):
+    bitboards = position.bitboards
+    base = by_color << 3
+    return ((PAWN_ATTACKS[by_color ^ 1][sq] & bitboards[base | PAWN])
+            | (KNIGHT_ATTACKS[sq] & bitboards[base | KNIGHT])
+            | (KING_ATTACKS[sq] & bitboards[base | KING])
+            | (bishop_attacks(sq, occupied) & (bitboards[base | BISHOP] | bitboards[base | QUEEN]))
+            | (rook_attacks(sq, occupied) & (bitboards[base | ROOK] | bitboards[base | QUEEN])))
+
+def is_square_attacked(position: Position, sq, by_color, occupied=None):
+    bitboards = position.bitboards
+    base = by_color << 3
+    if PAWN_ATTACKS[by_color ^ 1][sq] & bitboards[base | PAWN]:
+        return True
+    if KNIGHT_ATTACKS[sq] & bitboards[base | KNIGHT]:
+        return True
+    if KING_ATTACKS[sq] & bitboards[base | KING]:
+        return True
+    if occupied is None:
+        occupied = position.occupancy[0] | position.occupancy[1]
+    queens = bitboards[base | QUEEN]
+    if bishop_attacks(sq, occupied) & (bitboards[base | BISHOP] | queens):
+        return True
+    return bool(rook_attacks(sq, occupied) & (bitboards[base | ROOK] | queens))
+
+def pinned_pieces(position: Position, color):
+    # Enemy sliders that would hit our king through exactly one of our own
+    # pieces pin that piece to the line between them.
+    bitboards = position.bitboards
+    king_sq = position.king_squares[color]
+    enemy = (color ^ 1) << 3
+    own = position.occupancy[color]
+    enemy_occupancy = position.occupancy[color ^ 1]
+    queens = bitboards[enemy | QUEEN]
+    snipers = ((rook_attacks(king_sq, enemy_occupancy) & (bitboards[enemy | ROOK] | queens))
+               | (bishop_attacks(king_sq, enemy_occupancy) & (bitboards[enemy | BISHOP] | queens)))
+    pinned = 0
+    while snipers:
+        low = snipers & -snipers
+        blockers = BETWEEN[king_sq][low.bit_length() - 1] & (own | enemy_occupancy)
+        if blockers and not blockers & (blockers - 1) and blockers & own:
+            pinned |= blockers
+        snipers ^= low
+    return pinned
+
+def in_check(position: Position):
+    return is_square_attacked(position, position.king_squares[position.turn], position.turn ^ 1)
+
+def _add_moves(moves, from_sq, targets):
+    while targets:
+        low = targets & -targets
+        moves.append(from_sq | ((low.bit_length() - 1) << 6))
+        targets ^= low
+
+def _add_pawn_moves(moves, targets, offset, flags=0):
+    while targets:
+        low = targets & -targets
+        to_sq = low.bit_length() - 1
+        moves.append((to_sq - offset) | (to_sq << 6) | flags)
+        targets ^= low
+
+def _add_promotions(moves, targets, offset):
+    while targets:
+        low = targets & -targets
+        to_sq = low.bit_length() - 1
+        move = (to_sq - offset) | (to_sq << 6)
+        for code in PROMOTION_CODES:
+            moves.append(move | code)
+        targets ^= low
+
+def pseudo_legal_moves(position: Position, captures_only=False):
+    turn = position.turn
+    bitboards = position.bitboards
+    us = position.occupancy[turn]
+    them = position.occupancy[turn ^ 1]
+    occupied = us | them
+    empty = ~occupied & FULL
+    target_mask = them if captures_only else ~us & FULL
+    base = turn << 3
+    moves = []
+
+    pawns = bitboards[base | PAWN]
+    if turn == WHITE:
+        promotion_row, double_row, push = ROWS[0], ROWS[5], -8
+        singles = (pawns >> 8) & empty
+        doubles = ((singles & double_row) >> 8) & empty
+        west = ((pawns & ~FILE_A) >> 9) & them
+        east = ((pawns & ~FILE_H) >> 7) & them
+        west_offset, east_offset = -9, -7
+    else:
+        promotion_row, double_row, push = ROWS[7], ROWS[2], 8
+        singles = (pawns << 8) & empty
+        doubles = ((singles & double_row) << 8) & empty
+        west = ((pawns & ~FILE_A) << 7) & them
+        east = ((pawns & ~FILE_H) << 9) & them
+        west_offset, east_offset = 7, 9
+    _add_promotions(moves, singles & promotion_row, push)
+    _add_promotions(moves, west & promotion_row, west_offset)
+    _add_promotions(moves, east & promotion_row, east_offset)
+    _add_pawn_moves(moves, west & ~promotion_row, west_offset)
+    _add_pawn_moves(moves, east & ~promotion_row, east_offset)
+    if not captures_only:
+        _add_pawn_moves(moves, singles & ~promotion_row, push)
+        _add_pawn_moves(moves, doubles, push * 2, DOUBLE_PUSH_FLAG)
+    ep_square = position.ep_square
+    if ep_square != NO_SQUARE:
+        capturers = PAWN_ATTACKS[turn ^ 1][ep_square] & pawns
+        while capturers:
+            low = capturers & -capturers
+            moves.append((low.bit_length() - 1) | (ep_square << 6) | EN_PASSANT_FLAG)
+            capturers ^= low
+
+    append = moves.append
+    knights = bitboards[base | KNIGHT]
+    while knights:
+        low = knights & -knights
+        sq = low.bit_length() - 1
+        knights ^= low
+        targets = KNIGHT_ATTACKS[sq] & target_mask
+        while targets:
+            low = targets & -targets
+            append(sq | ((low.bit_length() - 1) << 6))
+            targets ^= low
+    diagonal = bitboards[base | BISHOP] | bitboards[base | QUEEN]
+    while diagonal:
+        low = diagonal & -diagonal
+        sq = low.bit_length() - 1
+        diagonal ^= low
+        targets = (DIAGONAL_ATTACKS[sq][occupied & DIAGONAL_MASKS[sq]]
+                   | ANTI_DIAGONAL_ATTACKS[sq][occupied & ANTI_DIAGONAL_MASKS[sq]]) & target_mask
+        while targets:
+            low = targets & -targets
+            append(sq | ((low.bit_length() - 1) << 6))
+            targets ^= low
+    straight = bitboards[base | ROOK] | bitboards[base | QUEEN]
+    while straight:
+        low = straight & -straight
+        sq = low.bit_length() - 1
+        straight ^= low
+        targets = (RANK_ATTACKS[sq][occupied & RANK_MASKS[sq]]
+                   | FILE_ATTACKS[sq][occupied & FILE_MASKS[sq]]) & target_mask
+        while targets:
+            low = targets & -targets
+            append(sq | ((low.bit_length() - 1) << 6))
+            targets ^= low
+
+    king_sq = position.king_squares[turn]
+    _add_moves(moves, king_sq, KING_ATTACKS[king_sq] & target_mask)
+    if not captures_only and position.castling:
+        _add_castling_moves(position, moves, king_sq, occupied)
+    return moves
+
+def _add_castling_moves(position: Position, moves, king_sq, occupied):
+    turn = position.turn
+    castling = position.castling
+    checked = None
+    for right, target, between, crossed in CASTLING_MOVES[turn]:
+        if not castling & right or occupied & between:
+            continue
+        if checked is None:
+            checked = is_square_attacked(position, king_sq, turn ^ 1)
+        if checked:
+            return
+        if not any(is_square_attacked(position, sq, turn ^ 1) for sq in crossed):
+            moves.append(king_sq | (target << 6) | CASTLE_FLAG)
+
+def generate_pseudo_legal_moves(position: Position, captures_only=False):
+    yield from pseudo_legal_moves(position, captures_only)
+
+def legal_moves(position: Position, captures_only=False):
+    # Checkers and pins are computed once per position, after which each
+    # pseudo-legal move is validated in constant time. Only king moves need
+    # an attack probe and only en passant (which can expose the king along
+    # the rank) falls back to make/unmake.
+    turn = position.turn
+    them = turn ^ 1
+    king_sq = position.king_squares[turn]
+    occupied = position.occupancy[0] | position.occupancy[1]
+    checkers = attackers_to(position, king_sq, them, occupied)
+    pinned = pinned_pieces(position, turn)
+    evasions = FULL
+    if checkers:
+        if checkers & (checkers - 1):
+            evasions = 0
+        else:
+            evasions = checkers | BETWEEN[king_sq][checkers.bit_length() - 1]
+    king_occupied = occupied ^ (1 << king_sq)
+    line = LINE[king_sq]
+    moves = []
+    for move in pseudo_legal_moves(position, captures_only):
+        from_sq = move & 63
+        if from_sq == king_sq:
+            if move >> 15 == FLAG_CASTLE or not is_square_attacked(position, (move >> 6) & 63, them, king_occupied):
+                moves.append(move)
+            continue
+        if move >> 15 == FLAG_EN_PASSANT:
+            position.make_move(move)
+            if not is_square_attacked(position, king_sq, them):
+                moves.append(move)
+            position.unmake_move()
+            continue
+        to_bit = 1 << ((move >> 6) & 63)
+        if not to_bit & evasions:
+            continue
+        if pinned & (1 << from_sq) and not to_bit & line[from_sq]:
+            continue
+        moves.append(move)
+    return moves
+
+def generate_legal_moves(position: Position, captures_only=False):
+    yield from legal_moves(position, captures_only)
+
+def has_legal_moves(position: Position):
+    return bool(legal_moves(position))
+
+def move_from_uci(position: Position, uci):
+    for move in legal_moves(position):
+        if move_to_uci(move) == uci:
+            return move
+    raise ValueError(f"Illegal move {uci} in {position.to_fen()}")
+
+def static_exchange(position: Position, move):
+    # Material balance of the capture sequence on the target square, each
+    # side always recapturing with its least valuable piece and free to stop
+    # when continuing would lose. Pieces are only lifted off the occupancy,
+    # so sliders behind them join in (x-rays) without making any moves.
+    if move >> 15 == FLAG_CASTLE:
+        return 0
+    board = position.board
+    bitboards = position.bitboards
+    from_sq = move & 63
+    to_sq = (move >> 6) & 63
+    promotion = (move >> 12) & 7
+    occupied = (position.occupancy[0] | position.occupancy[1]) ^ (1 << from_sq)
+    if move >> 15 == FLAG_EN_PASSANT:
+        captured_sq = to_sq + 8 if position.turn == WHITE else to_sq - 8
+        occupied ^= 1 << captured_sq
+        gains = [SEE_VALUES[PAWN]]
+    else:
+        gains = [SEE_VALUES[board[to_sq] & 7]]
+    on_square = SEE_VALUES[board[from_sq] & 7]
+    if promotion:
+        gains[0] += SEE_VALUES[promotion] - SEE_VALUES[PAWN]
+        on_square = SEE_VALUES[promotion]
+    side = position.turn ^ 1
+    while True:
+        attackers = attackers_to(position, to_sq, side, occupied) & occupied
+        if not attackers:
+            break
+        base = side << 3
+        for kind in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING):
+            candidates = attackers & bitboards[base | kind]
+            if candidates:
+                break
+        if kind == KING and attackers_to(position, to_sq, side ^ 1, occupied) & occupied:
+            break
+        gains.append(on_square - gains[-1])
+        occupied ^= candidates & -candidates
+        on_square = SEE_VALUES[kind]
+        side ^= 1
+    for index in range(len(gains) - 1, 0, -1):
+        gains[index - 1] = -max(-gains[index - 1], gains[index])
+    return gains[0]
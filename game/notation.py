@@ -0,0 +1,76 @@
+from game.piece import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, PIECE_SYMBOLS
+from game.move import FLAG_CASTLE, square_name
+from game.position import Position
+from game.movegen import legal_moves, in_check
+
+SAN_PIECES = {"N": KNIGHT, "B": BISHOP, "R": ROOK, "Q": QUEEN, "K": KING}
+
+def move_to_san(position: Position, move):
+    from_sq = move & 63
+    to_sq = (move >> 6) & 63
+    piece_kind = position.board[from_sq] & 7
+    if move >> 15 == FLAG_CASTLE:
+        san = "O-O" if to_sq > from_sq else "O-O-O"
+    else:
+        capture = position.is_capture(move)
+        if piece_kind == PAWN:
+            san = square_name(from_sq)[0] + "x" if capture else ""
+        else:
+            san = PIECE_SYMBOLS[piece_kind].upper()
+            # Disambiguate by file, then rank, then both, as SAN requires.
+            rivals = [other & 63 for other in legal_moves(position)
+                      if (other >> 6) & 63 == to_sq and other & 63 != from_sq
+                      and position.board[other & 63] & 7 == piece_kind]
+            if rivals and piece_kind != KING:
+                if all(rival & 7 != from_sq & 7 for rival in rivals):
+                    san += square_name(from_sq)[0]
+                elif all(rival >> 3 != from_sq >> 3 for rival in rivals):
+                    san += square_name(from_sq)[1]
+                else:
+                    san += square_name(from_sq)
+            if capture:
+                san += "x"
+        san += square_name(to_sq)
+        promotion = (move >> 12) & 7
+        if promotion:
+            san += "=" + PIECE_SYMBOLS[promotion].upper()
+    position.make_move(move)
+    if in_check(position):
+        san += "#" if not legal_moves(position) else "+"
+    position.unmake_move()
+    return san
+
+def move_from_san(position: Position, san):
+    text = san.rstrip("+#!?").replace("0", "O")
+    moves = legal_moves(position)
+    if text in ("O-O", "O-O-O"):
+        for move in moves:
+            if move >> 15 == FLAG_CASTLE and (((move >> 6) & 63) > (move & 63)) == (text == "O-O"):
+                return move
+        raise ValueError(f"Illegal move {san} in {position.to_fen()}")
+    promotion = 0
+    if "=" in text:
+        text, symbol = text.split("=", 1)
+        if not symbol or symbol[0].upper() not in "NBRQ":
+            raise ValueError(f"Invalid move {san}")
+        promotion = SAN_PIECES[symbol[0].upper()]
+    elif len(text) > 2 and text[-1].upper() in "NBRQ" and text[-2].isdigit():
+        promotion = SAN_PIECES[text[-1].upper()]
+        text = text[:-1]
+    piece_kind = PAWN
+    if text[:1] in SAN_PIECES:
+        piece_kind = SAN_PIECES[text[0]]
+        text = text[1:]
+    text = text.replace("x", "").replace("-", "")
+    if len(text) < 2:
+        raise ValueError(f"Invalid move {san}")
+    target, hint = text[-2:], text[:-2]
+    candidates = []
+    for move in moves:
+        from_name = square_name(move & 63)
+        if (square_name((move >> 6) & 63) == target and position.board[move & 63] & 7 == piece_kind
+                and (move >> 12) & 7 == promotion and all(char in from_name for char in hint)):
+            candidates.append(move)
+    if len(candidates) != 1:
+        raise ValueError(f"{'Ambiguous' if candidates else 'Illegal'} move {san} in {position.to_fen()}")
+    return candidates[0]
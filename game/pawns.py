@@ -0,0 +1,113 @@
+from array import array
+from game.piece import PAWN, WHITE, BLACK
+from game.bitboard import FILE_A, squares
+
+# Scores are (middlegame, endgame) pairs from white's point of view, added to
+# the piece-square totals before tapering.
+DOUBLED_PAWN = (-10, -20)
+ISOLATED_PAWN = (-10, -15)
+# Indexed by how far the pawn has advanced (1 = home row, 6 = one step from
+# promotion).
+PASSED_PAWN_MG = [0, 5, 10, 15, 25, 40, 60, 0]
+PASSED_PAWN_EG = [0, 10, 20, 30, 50, 75, 110, 0]
+# Middlegame bonus per own pawn one and two rows in front of the king.
+SHIELD_NEAR = 15
+SHIELD_FAR = 8
+
+ENTRY_BYTES = 16
+
+FILES = [FILE_A << col for col in range(8)]
+ADJACENT_FILES = [(FILES[col - 1] if col > 0 else 0) | (FILES[col + 1] if col < 7 else 0) for col in range(8)]
+
+def _rows_mask(rows, col):
+    mask = 0
+    for row in rows:
+        for file_col in range(max(col - 1, 0), min(col + 1, 7) + 1):
+            mask |= 1 << (row * 8 + file_col)
+    return mask
+
+# Squares in front of a pawn on its own and the adjacent files (white moves
+# towards row 0); no enemy pawn there makes it passed.
+PASSED_MASKS = [[_rows_mask(range(0, sq >> 3), sq & 7) for sq in range(64)],
+                [_rows_mask(range((sq >> 3) + 1, 8), sq & 7) for sq in range(64)]]
+
+def _shield_masks(sq, step):
+    # The own-pawn rows one and two steps in front of a king on sq.
+    rows = [(sq >> 3) + step, (sq >> 3) + 2 * step]
+    return tuple(_rows_mask([row], sq & 7) if 0 <= row < 8 else 0 for row in rows)
+
+SHIELD_MASKS = [[_shield_masks(sq, -1) for sq in range(64)], [_shield_masks(sq, 1) for sq in range(64)]]
+
+def pawn_structure(position):
+    # Doubled, isolated and passed pawns plus king shelter; everything here
+    # depends only on pawn and king squares, which is what pawn_key hashes.
+    middlegame = endgame = 0
+    pawns = (position.bitboards[PAWN], position.bitboards[BLACK << 3 | PAWN])
+    for color in (WHITE, BLACK):
+        sign = -1 if color else 1
+        own, enemy = pawns[color], pawns[color ^ 1]
+        mg = eg = 0
+        for col in range(8):
+            count = (own & FILES[col]).bit_count()
+            if count > 1:
+                mg += DOUBLED_PAWN[0] * (count - 1)
+                eg += DOUBLED_PAWN[1] * (count - 1)
+        for sq in squares(own):
+            col = sq & 7
+            if not own & ADJACENT_FILES[col]:
+                mg += ISOLATED_PAWN[0]
+                eg += ISOLATED_PAWN[1]
+            passed_mask = PASSED_MASKS[color][sq]
+            # The rear pawn of a doubled pair is not passed.
+            if not enemy & passed_mask and not own & passed_mask & FILES[col]:
+                advance = sq >> 3 if color else 7 - (sq >> 3)
+                mg += PASSED_PAWN_MG[advance]
+                eg += PASSED_PAWN_EG[advance]
+        near, far = SHIELD_MASKS[color][position.king_squares[color]]
+        mg += SHIELD_NEAR * (own & near).bit_count() + SHIELD_FAR * (own & far).bit_count()
+        middlegame += sign * mg
+        endgame += sign * eg
+    return middlegame, endgame
+
+class PawnHashTable:
+    # Direct-mapped, always-replace cache of pawn_structure keyed by
+    # pawn_key. Pawn structure rarely changes between sibling nodes, so
+    # nearly every leaf is a hit.
+    def __init__(self, size_mb=1):
+        entries = max(1, (size_mb * 1024 * 1024) // ENTRY_BYTES)
+        self.capacity = 1 << (entries.bit_length() - 1)
+        self.mask = self.capacity - 1
+        self.size_mb = size_mb
+        self.keys = array("Q", bytes(8 * self.capacity))
+        self.middlegame = array("i", bytes(4 * self.capacity))
+        self.endgame = array("i", bytes(4 * self.capacity))
+        self.probes = 0
+        self.hits = 0
+
+    def clear(self):
+        self.keys = array("Q", bytes(8 * self.capacity))
+        self.probes = self.hits = 0
+
+    def probe(self, position):
+        # Returns the (middlegame, endgame) pawn terms, computing and storing
+        # them on a miss. Key 0 marks an empty slot, so that key (no pawns,
+        # no kings) is simply recomputed each time.
+        self.probes += 1
+        key = position.pawn_key
+        index = key & self.mask
+        if self.keys[index] == key and key:
+            self.hits += 1
+            return self.middlegame[index], self.endgame[index]
+        middlegame, endgame = pawn_structure(position)
+        self.keys[index] = key
+        self.middlegame[index] = middlegame
+        self.endgame[index] = endgame
+        return middlegame, endgame
+
+    def stats(self):
+        return {
+            "size_mb": self.size_mb,
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.probes if self.probes else 0.0,
+        }
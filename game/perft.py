@@ -0,0 +1,109 @@
+import argparse
+import sys
+import time
+from game.position import Position, STARTING_FEN
+from game.movegen import legal_moves
+from game.move import move_to_uci
+
+# (name, FEN, {depth: leaf nodes}) with published reference counts.
+PERFT_SUITE = [
+    ("startpos", STARTING_FEN, {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609}),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     {1: 48, 2: 2039, 3: 97862, 4: 4085603}),
+    ("position3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624}),
+    ("position4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     {1: 6, 2: 264, 3: 9467, 4: 422333}),
+    ("position5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", {1: 44, 2: 1486, 3: 62379, 4: 2103487}),
+    ("position6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     {1: 46, 2: 2079, 3: 89890}),
+    ("illegal-ep-pin", "3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1", {6: 1134888}),
+    ("illegal-ep-discovery", "8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1", {6: 1015133}),
+    ("ep-gives-check", "8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1", {6: 1440467}),
+    ("short-castle-check", "5k2/8/8/8/8/8/8/4K2R w K - 0 1", {6: 661072}),
+    ("long-castle-check", "3k4/8/8/8/8/8/8/R3K3 w Q - 0 1", {6: 803711}),
+    ("castling-rights", "r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1", {4: 1274206}),
+    ("castling-prevented", "r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1", {4: 1720476}),
+    ("promote-out-of-check", "2K2r2/4P3/8/8/8/8/8/3k4 w - - 0 1", {6: 3821001}),
+    ("discovered-check", "8/8/1P2K3/8/2n5/1q6/8/5k2 b - - 0 1", {5: 1004658}),
+    ("promote-to-check", "4k3/1P6/8/8/8/8/K7/8 w - - 0 1", {6: 217342}),
+    ("underpromote-to-check", "8/P1k5/K7/8/8/8/8/8 w - - 0 1", {6: 92683}),
+    ("self-stalemate", "K1k5/8/P7/8/8/8/8/8 w - - 0 1", {6: 2217}),
+    ("stalemate-checkmate", "8/k1P5/8/1K6/8/8/8/8 w - - 0 1", {7: 567584}),
+    ("stalemate-checkmate-2", "8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1", {4: 23527}),
+]
+
+def perft(position: Position, depth):
+    if depth <= 0:
+        return 1
+    moves = legal_moves(position)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        position.make_move(move)
+        nodes += perft(position, depth - 1)
+        position.unmake_move()
+    return nodes
+
+def divide(position: Position, depth):
+    # Per-root-move leaf counts, for bisecting a mismatch against another engine.
+    counts = {}
+    for move in legal_moves(position):
+        position.make_move(move)
+        counts[move_to_uci(move)] = perft(position, depth - 1)
+        position.unmake_move()
+    return counts
+
+def run_suite(max_nodes=None, out=sys.stdout):
+    # Returns True when every counted entry matches its reference.
+    passed = True
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, expected in PERFT_SUITE:
+        for depth, expected_nodes in sorted(expected.items()):
+            if max_nodes is not None and expected_nodes > max_nodes:
+                continue
+            start = time.perf_counter()
+            nodes = perft(Position.from_fen(fen), depth)
+            elapsed = time.perf_counter() - start
+            total_nodes += nodes
+            total_time += elapsed
+            status = "ok" if nodes == expected_nodes else f"FAIL (expected {expected_nodes})"
+            passed = passed and nodes == expected_nodes
+            print(f"{name:24} depth {depth}  {nodes:>10}  {status}  {nps(nodes, elapsed)} nps", file=out)
+    print(f"total {total_nodes} nodes in {total_time:.2f}s, {nps(total_nodes, total_time)} nps", file=out)
+    return passed
+
+def nps(nodes, elapsed):
+    return int(nodes / elapsed) if elapsed > 0 else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Count leaf nodes of the legal move tree.")
+    parser.add_argument("depth", nargs="?", type=int, default=4)
+    parser.add_argument("--fen", default=STARTING_FEN)
+    parser.add_argument("--divide", action="store_true", help="print the count below each root move")
+    parser.add_argument("--suite", action="store_true", help="check the built-in reference positions")
+    parser.add_argument("--max-nodes", type=int, default=None, help="skip suite entries larger than this")
+    args = parser.parse_args(argv)
+
+    if args.suite:
+        return 0 if run_suite(args.max_nodes) else 1
+
+    position = Position.from_fen(args.fen)
+    start = time.perf_counter()
+    if args.divide:
+        counts = divide(position, args.depth)
+        for uci, count in sorted(counts.items()):
+            print(f"{uci}: {count}")
+        nodes = sum(counts.values())
+        print(f"\nmoves {len(counts)}")
+    else:
+        nodes = perft(position, args.depth)
+    elapsed = time.perf_counter() - start
+    print(f"nodes {nodes}")
+    print(f"time {elapsed:.3f}s")
+    print(f"nps {nps(nodes, elapsed)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
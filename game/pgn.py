@@ -0,0 +1,258 @@
+import argparse
+import multiprocessing
+import os
+import re
+import sys
+import time
+from collections import Counter
+from game.position import Position, STARTING_FEN
+from game.notation import move_from_san
+from game.book import write_book
+from utils.polyglot import polyglot_key
+
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+HEADER = re.compile(r'\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]')
+MOVE_NUMBER = re.compile(r"^\d+\.+")
+# Plies of each game that go into an opening book.
+BOOK_PLY = 20
+
+class PGNGame:
+    def __init__(self, headers, moves, result, offset=0):
+        self.headers = headers
+        self.moves = moves
+        self.result = result
+        self.offset = offset
+
+    def start_position(self):
+        return Position.from_fen(self.headers.get("FEN", STARTING_FEN))
+
+    def replay(self):
+        # Yields (position, move) before each move is played; the position is
+        # updated in place, so copy it to keep it.
+        position = self.start_position()
+        for san in self.moves:
+            move = move_from_san(position, san)
+            yield position, move
+            position.make_move(move)
+
+def _movetext_tokens(text, state):
+    # Splits movetext into SAN moves and results, dropping comments,
+    # variations, NAGs and move numbers. state carries open braces and
+    # parentheses across lines.
+    tokens = []
+    index = 0
+    length = len(text)
+    while index < length:
+        char = text[index]
+        if state["comment"]:
+            end = text.find("}", index)
+            if end < 0:
+                break
+            state["comment"] = False
+            index = end + 1
+        elif char == "{":
+            state["comment"] = True
+            index += 1
+        elif char == ";":
+            break
+        elif char == "(":
+            state["variation"] += 1
+            index += 1
+        elif char == ")":
+            state["variation"] = max(0, state["variation"] - 1)
+            index += 1
+        elif char.isspace():
+            index += 1
+        else:
+            end = index
+            while end < length and not text[end].isspace() and text[end] not in "{}();":
+                end += 1
+            token = text[index:end]
+            index = end
+            if state["variation"] or token.startswith("$"):
+                continue
+            token = MOVE_NUMBER.sub("", token)
+            if token:
+                tokens.append(token)
+    return tokens
+
+def read_games(lines, start_offset=0, end_offset=None):
+    # Generator over the games of a PGN stream, one game in memory at a time.
+    # lines yields bytes or str; with byte offsets, only games starting
+    # before end_offset are returned.
+    headers, moves, result = {}, [], None
+    state = {"comment": False, "variation": 0}
+    offset = start_offset
+    game_offset = offset
+    in_moves = False
+    for line in lines:
+        line_offset = offset
+        offset += len(line)
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", "replace")
+        stripped = line.strip()
+        if not state["comment"] and stripped.startswith("["):
+            if in_moves or result is not None:
+                yield PGNGame(headers, moves, result or "*", game_offset)
+                headers, moves, result = {}, [], None
+                in_moves = False
+            if not headers:
+                game_offset = line_offset
+                if end_offset is not None and game_offset >= end_offset:
+                    return
+            match = HEADER.match(stripped)
+            if match:
+                headers[match.group(1)] = match.group(2).replace('\\"', '"')
+            continue
+        if not stripped or stripped.startswith("%"):
+            continue
+        if not in_moves and not headers:
+            game_offset = line_offset
+            if end_offset is not None and game_offset >= end_offset:
+                return
+        in_moves = True
+        for token in _movetext_tokens(line, state):
+            if token in RESULTS:
+                result = token
+            else:
+                moves.append(token)
+        if result is not None:
+            yield PGNGame(headers, moves, result, game_offset)
+            headers, moves, result = {}, [], None
+            state = {"comment": False, "variation": 0}
+            in_moves = False
+    if in_moves or headers:
+        yield PGNGame(headers, moves, result or headers.get("Result", "*"), game_offset)
+
+def split_offsets(path, parts):
+    # Byte ranges of roughly equal size, each starting at a game boundary
+    # (a line beginning with "[Event "), so workers never share a game.
+    size = os.path.getsize(path)
+    offsets = [0]
+    with open(path, "rb") as handle:
+        for part in range(1, parts):
+            handle.seek(max(offsets[-1], size * part // parts))
+            handle.readline()
+            while True:
+                position = handle.tell()
+                line = handle.readline()
+                if not line or line.startswith(b"[Event "):
+                    break
+            if position > offsets[-1] and line:
+                offsets.append(position)
+    offsets.append(size)
+    return list(zip(offsets, offsets[1:]))
+
+class Aggregate:
+    # Per-worker totals; merged with add() in the parent.
+    def __init__(self):
+        self.games = 0
+        self.errors = 0
+        self.positions = 0
+        self.results = Counter()
+        self.move_counts = Counter()
+        self.move_points = Counter()
+
+    def add(self, other):
+        self.games += other.games
+        self.errors += other.errors
+        self.positions += other.positions
+        self.results.update(other.results)
+        self.move_counts.update(other.move_counts)
+        self.move_points.update(other.move_points)
+        return self
+
+    def prune(self, min_count):
+        # Drops moves too rare to enter the book once every range is merged;
+        # pruning per range would undercount moves split across ranges.
+        for entry in [entry for entry, count in self.move_counts.items() if count < min_count]:
+            del self.move_counts[entry]
+            del self.move_points[entry]
+        return self
+
+    def book_entries(self, min_count=1):
+        # Polyglot-style weights: two points per win and one per draw for the
+        # side that played the move.
+        for (key, move), count in self.move_counts.items():
+            if count >= min_count:
+                yield key, move, self.move_points[key, move]
+
+def process_range(path, start, end, max_ply=None, positions_path=None, book_ply=None):
+    # Move counts are only collected for the first book_ply plies, and not at
+    # all without a book_ply, so they stay bounded by the opening tree.
+    aggregate = Aggregate()
+    positions_file = open(positions_path, "w") if positions_path else None
+    try:
+        with open(path, "rb") as handle:
+            handle.seek(start)
+            for game in read_games(handle, start, end):
+                aggregate.games += 1
+                aggregate.results[game.result] += 1
+                points = {"1-0": (2, 0), "0-1": (0, 2), "1/2-1/2": (1, 1)}.get(game.result, (0, 0))
+                try:
+                    for ply, (position, move) in enumerate(game.replay()):
+                        if max_ply is not None and ply >= max_ply:
+                            break
+                        aggregate.positions += 1
+                        if book_ply is not None and ply < book_ply:
+                            key = polyglot_key(position)
+                            aggregate.move_counts[key, move] += 1
+                            aggregate.move_points[key, move] += points[position.turn]
+                        if positions_file is not None:
+                            positions_file.write(f"{position.to_fen()} {game.result}\n")
+                except ValueError:
+                    aggregate.errors += 1
+    finally:
+        if positions_file is not None:
+            positions_file.close()
+    return aggregate
+
+def _process_job(job):
+    return process_range(*job)
+
+def ingest(path, workers=None, max_ply=None, positions_path=None, book_ply=None, min_count=1):
+    # Splits the file across a process pool and merges the per-worker
+    # aggregates; training positions are written per range and concatenated
+    # in file order.
+    workers = workers or multiprocessing.cpu_count()
+    ranges = split_offsets(path, workers)
+    parts = [f"{positions_path}.part{index}" if positions_path else None for index in range(len(ranges))]
+    jobs = [(path, start, end, max_ply, part, book_ply) for (start, end), part in zip(ranges, parts)]
+    total = Aggregate()
+    with multiprocessing.Pool(min(workers, len(jobs))) as pool:
+        for aggregate in pool.imap(_process_job, jobs):
+            total.add(aggregate)
+    total.prune(min_count)
+    if positions_path:
+        with open(positions_path, "w") as out:
+            for part in parts:
+                with open(part) as handle:
+                    for line in handle:
+                        out.write(line)
+                os.remove(part)
+    return total
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parse PGN archives into opening books and position datasets.")
+    parser.add_argument("pgn")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--book", help="write an opening book to this path")
+    parser.add_argument("--max-ply", type=int, default=None, help="only use the first plies of each game")
+    parser.add_argument("--book-ply", type=int, default=BOOK_PLY, help=f"plies per game used for the book (default: {BOOK_PLY})")
+    parser.add_argument("--min-count", type=int, default=1, help="minimum games for a book move")
+    parser.add_argument("--positions", help="write every position as 'FEN result' lines to this path")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    book_ply = args.book_ply if args.book else None
+    total = ingest(args.pgn, args.workers, args.max_ply, args.positions, book_ply, args.min_count)
+    elapsed = time.perf_counter() - start
+    print(f"{total.games} games, {total.positions} positions, {total.errors} unparsable in {elapsed:.2f}s")
+    print("results: " + ", ".join(f"{result} {total.results[result]}" for result in RESULTS))
+    if args.book:
+        count = write_book(args.book, total.book_entries(args.min_count))
+        print(f"book: {count} entries written to {args.book}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
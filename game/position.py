@@ -0,0 +1,347 @@
+from typing import List
+from game.piece import EMPTY, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE, BLACK, make_piece, piece_symbol, piece_from_symbol
+from game.move import NO_SQUARE, FLAG_DOUBLE_PUSH, FLAG_EN_PASSANT, FLAG_CASTLE, square_name, parse_square
+from game.evaluation import MIDDLEGAME_SCORES, ENDGAME_SCORES, PHASE_WEIGHTS, eval_terms
+from game.bitboard import KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, rook_attacks, bishop_attacks
+from utils.zobrist import PIECE_KEYS, SIDE_KEY, CASTLING_KEYS, EP_FILE_KEYS, compute_key, compute_pawn_key
+
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+WHITE_KINGSIDE = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE = 4
+BLACK_QUEENSIDE = 8
+CASTLING_SYMBOLS = ((WHITE_KINGSIDE, "K"), (WHITE_QUEENSIDE, "Q"), (BLACK_KINGSIDE, "k"), (BLACK_QUEENSIDE, "q"))
+
+# Rights that survive a move touching the square; rooks and kings leaving
+# (or rooks being captured on) their home squares clear the matching bits.
+CASTLING_MASK = [15] * 64
+CASTLING_MASK[0] &= ~BLACK_QUEENSIDE
+CASTLING_MASK[7] &= ~BLACK_KINGSIDE
+CASTLING_MASK[4] &= ~(BLACK_KINGSIDE | BLACK_QUEENSIDE)
+CASTLING_MASK[56] &= ~WHITE_QUEENSIDE
+CASTLING_MASK[63] &= ~WHITE_KINGSIDE
+CASTLING_MASK[60] &= ~(WHITE_KINGSIDE | WHITE_QUEENSIDE)
+
+# Castling right -> (king square, rook square) it needs.
+CASTLING_PIECES = {
+    WHITE_KINGSIDE: (60, 63),
+    WHITE_QUEENSIDE: (60, 56),
+    BLACK_KINGSIDE: (4, 7),
+    BLACK_QUEENSIDE: (4, 0),
+}
+
+LIGHT_SQUARES = sum(1 << sq for sq in range(64) if ((sq >> 3) + (sq & 7)) % 2 == 0)
+
+class Position:
+    def __init__(self):
+        self.board: List[int] = [EMPTY] * 64
+        self.bitboards: List[int] = [0] * 15
+        self.occupancy: List[int] = [0, 0]
+        self.turn: int = WHITE
+        self.castling: int = 0
+        self.ep_square: int = NO_SQUARE
+        self.halfmove_clock: int = 0
+        self.fullmove_number: int = 1
+        self.king_squares: List[int] = [NO_SQUARE, NO_SQUARE]
+        self.key: int = 0
+        self.pawn_key: int = 0
+        self.mg_score: int = 0
+        self.eg_score: int = 0
+        self.phase: int = 0
+        self.undo_stack = []
+
+    @classmethod
+    def from_fen(cls, fen=STARTING_FEN):
+        position = cls()
+        fields = fen.split()
+        if len(fields) < 4:
+            raise ValueError(f"Invalid FEN: {fen}")
+        rows = fields[0].split("/")
+        if len(rows) != 8:
+            raise ValueError(f"Invalid FEN: {fen}")
+        for row, row_text in enumerate(rows):
+            col = 0
+            for char in row_text:
+                if char.isdigit():
+                    col += int(char)
+                elif col < 8:
+                    position.put_piece(row * 8 + col, piece_from_symbol(char))
+                    col += 1
+                else:
+                    raise ValueError(f"Invalid FEN: {fen}")
+            if col != 8:
+                raise ValueError(f"Invalid FEN: {fen}")
+        if fields[1] not in ("w", "b"):
+            raise ValueError(f"Invalid side to move in FEN: {fen}")
+        position.turn = WHITE if fields[1] == "w" else BLACK
+        if fields[2] != "-" and (not fields[2] or any(char not in "KQkq" for char in fields[2])):
+            raise ValueError(f"Invalid castling rights in FEN: {fen}")
+        for right, symbol in CASTLING_SYMBOLS:
+            if symbol in fields[2]:
+                position.castling |= right
+        if fields[3] != "-":
+            # Only the rank a double push skips over can hold the target.
+            if (len(fields[3]) != 2 or fields[3][0] not in "abcdefgh"
+                    or fields[3][1] != ("6" if position.turn == WHITE else "3")):
+                raise ValueError(f"Invalid en passant square in FEN: {fen}")
+            position.ep_square = parse_square(fields[3])
+            if not position.can_capture_en_passant(position.ep_square):
+                position.ep_square = NO_SQUARE
+        position.validate(fen)
+        if len(fields) > 4:
+            position.halfmove_clock = int(fields[4])
+        if len(fields) > 5:
+            position.fullmove_number = int(fields[5])
+        position.key = compute_key(position)
+        position.pawn_key = compute_pawn_key(position)
+        position.mg_score, position.eg_score, position.phase = eval_terms(position.board)
+        return position
+
+    def validate(self, fen):
+        # Everything move generation relies on: one king each, no pawns on
+        # the back ranks, castling rights backed by king and rook on their
+        # home squares, and a side not to move that is not in check.
+        bitboards = self.bitboards
+        for color in (WHITE, BLACK):
+            if bitboards[color << 3 | KING].bit_count() != 1:
+                raise ValueError(f"FEN needs exactly one king per side: {fen}")
+        if (bitboards[PAWN] | bitboards[BLACK << 3 | PAWN]) & (0xFF | 0xFF << 56):
+            raise ValueError(f"Pawn on the first or last rank in FEN: {fen}")
+        for right, (king_sq, rook_sq) in CASTLING_PIECES.items():
+            color = BLACK if right & (BLACK_KINGSIDE | BLACK_QUEENSIDE) else WHITE
+            if self.castling & right and (self.board[king_sq] != make_piece(color, KING)
+                                          or self.board[rook_sq] != make_piece(color, ROOK)):
+                raise ValueError(f"Castling rights without king and rook on their squares in FEN: {fen}")
+        if self.is_attacked(self.king_squares[self.turn ^ 1], self.turn):
+            raise ValueError(f"Side not to move is in check in FEN: {fen}")
+
+    def is_attacked(self, sq, by_color):
+        bitboards = self.bitboards
+        base = by_color << 3
+        occupied = self.occupancy[0] | self.occupancy[1]
+        queens = bitboards[base | QUEEN]
+        return bool((PAWN_ATTACKS[by_color ^ 1][sq] & bitboards[base | PAWN])
+                    or (KNIGHT_ATTACKS[sq] & bitboards[base | KNIGHT])
+                    or (KING_ATTACKS[sq] & bitboards[base | KING])
+                    or (bishop_attacks(sq, occupied) & (bitboards[base | BISHOP] | queens))
+                    or (rook_attacks(sq, occupied) & (bitboards[base | ROOK] | queens)))
+
+    def to_fen(self):
+        rows = []
+        for row in range(8):
+            row_text = ""
+            empty = 0
+            for col in range(8):
+                piece = self.board[row * 8 + col]
+                if piece == EMPTY:
+                    empty += 1
+                    continue
+                if empty:
+                    row_text += str(empty)
+                    empty = 0
+                row_text += piece_symbol(piece)
+            if empty:
+                row_text += str(empty)
+            rows.append(row_text)
+        castling = "".join(symbol for right, symbol in CASTLING_SYMBOLS if self.castling & right) or "-"
+        ep = square_name(self.ep_square) if self.ep_square != NO_SQUARE else "-"
+        turn = "w" if self.turn == WHITE else "b"
+        return f"{'/'.join(rows)} {turn} {castling} {ep} {self.halfmove_clock} {self.fullmove_number}"
+
+    def copy(self):
+        position = Position()
+        position.board = self.board[:]
+        position.bitboards = self.bitboards[:]
+        position.occupancy = self.occupancy[:]
+        position.king_squares = self.king_squares[:]
+        position.undo_stack = self.undo_stack[:]
+        position.turn = self.turn
+        position.castling = self.castling
+        position.ep_square = self.ep_square
+        position.halfmove_clock = self.halfmove_clock
+        position.fullmove_number = self.fullmove_number
+        position.key = self.key
+        position.pawn_key = self.pawn_key
+        position.mg_score = self.mg_score
+        position.eg_score = self.eg_score
+        position.phase = self.phase
+        return position
+
+    def put_piece(self, sq, piece):
+        self.board[sq] = piece
+        self.bitboards[piece] |= 1 << sq
+        self.occupancy[piece >> 3] |= 1 << sq
+        if piece & 7 == KING:
+            self.king_squares[piece >> 3] = sq
+
+    def piece_at(self, sq):
+        return self.board[sq]
+
+    def can_capture_en_passant(self, ep_square):
+        # Only record an en-passant square when an enemy pawn could take on it,
+        # so identical positions compare (and later hash) identically.
+        pawn_sq = ep_square + 8 if self.turn == WHITE else ep_square - 8
+        capturer = make_piece(self.turn, PAWN)
+        col = pawn_sq & 7
+        return (col > 0 and self.board[pawn_sq - 1] == capturer) or (col < 7 and self.board[pawn_sq + 1] == capturer)
+
+    def is_capture(self, move):
+        return self.board[(move >> 6) & 63] != EMPTY or move >> 15 == FLAG_EN_PASSANT
+
+    def make_move(self, move):
+        board = self.board
+        turn = self.turn
+        from_sq = move & 63
+        to_sq = (move >> 6) & 63
+        promotion = (move >> 12) & 7
+        flag = move >> 15
+        piece = board[from_sq]
+        captured_sq = to_sq
+        if flag == FLAG_EN_PASSANT:
+            captured_sq = to_sq + 8 if turn == WHITE else to_sq - 8
+        captured = board[captured_sq]
+        key = self.key
+        self.undo_stack.append((move, captured, self.castling, self.ep_square, self.halfmove_clock, key,
+                                self.mg_score, self.eg_score, self.phase, self.pawn_key))
+        bitboards = self.bitboards
+        occupancy = self.occupancy
+        placed = promotion | (turn << 3) if promotion else piece
+        mg_score = self.mg_score + MIDDLEGAME_SCORES[placed][to_sq] - MIDDLEGAME_SCORES[piece][from_sq]
+        eg_score = self.eg_score + ENDGAME_SCORES[placed][to_sq] - ENDGAME_SCORES[piece][from_sq]
+        if promotion:
+            self.phase += PHASE_WEIGHTS[placed]
+
+        board[from_sq] = EMPTY
+        if captured:
+            board[captured_sq] = EMPTY
+            bitboards[captured] ^= 1 << captured_sq
+            occupancy[turn ^ 1] ^= 1 << captured_sq
+            key ^= PIECE_KEYS[captured][captured_sq]
+            mg_score -= MIDDLEGAME_SCORES[captured][captured_sq]
+            eg_score -= ENDGAME_SCORES[captured][captured_sq]
+            self.phase -= PHASE_WEIGHTS[captured]
+            if captured & 7 == PAWN:
+                self.pawn_key ^= PIECE_KEYS[captured][captured_sq]
+        if flag == FLAG_CASTLE:
+            rook_from, rook_to = (to_sq + 1, to_sq - 1) if to_sq > from_sq else (to_sq - 2, to_sq + 1)
+            rook = board[rook_from]
+            board[rook_to] = rook
+            board[rook_from] = EMPTY
+            bitboards[rook] ^= (1 << rook_from) | (1 << rook_to)
+            occupancy[turn] ^= (1 << rook_from) | (1 << rook_to)
+            key ^= PIECE_KEYS[rook][rook_from] ^ PIECE_KEYS[rook][rook_to]
+            mg_score += MIDDLEGAME_SCORES[rook][rook_to] - MIDDLEGAME_SCORES[rook][rook_from]
+            eg_score += ENDGAME_SCORES[rook][rook_to] - ENDGAME_SCORES[rook][rook_from]
+        self.mg_score = mg_score
+        self.eg_score = eg_score
+        board[to_sq] = placed
+        bitboards[piece] ^= 1 << from_sq
+        bitboards[placed] ^= 1 << to_sq
+        occupancy[turn] ^= (1 << from_sq) | (1 << to_sq)
+        key ^= PIECE_KEYS[piece][from_sq] ^ PIECE_KEYS[placed][to_sq]
+        if piece & 7 == KING:
+            self.king_squares[turn] = to_sq
+            self.pawn_key ^= PIECE_KEYS[piece][from_sq] ^ PIECE_KEYS[piece][to_sq]
+        elif piece & 7 == PAWN:
+            # A promoted pawn leaves the pawn structure.
+            self.pawn_key ^= PIECE_KEYS[piece][from_sq] if promotion else PIECE_KEYS[piece][from_sq] ^ PIECE_KEYS[piece][to_sq]
+
+        castling = self.castling & CASTLING_MASK[from_sq] & CASTLING_MASK[to_sq]
+        key ^= CASTLING_KEYS[self.castling] ^ CASTLING_KEYS[castling] ^ SIDE_KEY
+        self.castling = castling
+        if self.ep_square != NO_SQUARE:
+            key ^= EP_FILE_KEYS[self.ep_square & 7]
+        if piece & 7 == PAWN or captured:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        if turn == BLACK:
+            self.fullmove_number += 1
+        self.turn = turn ^ 1
+        self.ep_square = NO_SQUARE
+        if flag == FLAG_DOUBLE_PUSH:
+            ep_square = (from_sq + to_sq) >> 1
+            if self.can_capture_en_passant(ep_square):
+                self.ep_square = ep_square
+                key ^= EP_FILE_KEYS[ep_square & 7]
+        self.key = key
+
+    def unmake_move(self):
+        (move, captured, castling, ep_square, halfmove_clock, self.key,
+         self.mg_score, self.eg_score, self.phase, self.pawn_key) = self.undo_stack.pop()
+        board = self.board
+        self.turn ^= 1
+        turn = self.turn
+        from_sq = move & 63
+        to_sq = (move >> 6) & 63
+        flag = move >> 15
+        bitboards = self.bitboards
+        occupancy = self.occupancy
+        placed = board[to_sq]
+        piece = make_piece(turn, PAWN) if (move >> 12) & 7 else placed
+
+        board[from_sq] = piece
+        board[to_sq] = EMPTY
+        bitboards[piece] ^= 1 << from_sq
+        bitboards[placed] ^= 1 << to_sq
+        occupancy[turn] ^= (1 << from_sq) | (1 << to_sq)
+        if captured:
+            captured_sq = (to_sq + 8 if turn == WHITE else to_sq - 8) if flag == FLAG_EN_PASSANT else to_sq
+            board[captured_sq] = captured
+            bitboards[captured] ^= 1 << captured_sq
+            occupancy[turn ^ 1] ^= 1 << captured_sq
+        elif flag == FLAG_CASTLE:
+            rook_from, rook_to = (to_sq + 1, to_sq - 1) if to_sq > from_sq else (to_sq - 2, to_sq + 1)
+            rook = board[rook_to]
+            board[rook_from] = rook
+            board[rook_to] = EMPTY
+            bitboards[rook] ^= (1 << rook_from) | (1 << rook_to)
+            occupancy[turn] ^= (1 << rook_from) | (1 << rook_to)
+        if piece & 7 == KING:
+            self.king_squares[turn] = from_sq
+
+        self.castling = castling
+        self.ep_square = ep_square
+        self.halfmove_clock = halfmove_clock
+        if turn == BLACK:
+            self.fullmove_number -= 1
+
+    def make_null_move(self):
+        # Passes the turn for null-move pruning. The half-move clock restarts
+        # so repetition checks never look back across the pass.
+        self.undo_stack.append((0, EMPTY, self.castling, self.ep_square, self.halfmove_clock, self.key,
+                                self.mg_score, self.eg_score, self.phase, self.pawn_key))
+        self.key ^= SIDE_KEY
+        if self.ep_square != NO_SQUARE:
+            self.key ^= EP_FILE_KEYS[self.ep_square & 7]
+            self.ep_square = NO_SQUARE
+        self.halfmove_clock = 0
+        self.turn ^= 1
+
+    def unmake_null_move(self):
+        (_, _, self.castling, self.ep_square, self.halfmove_clock, self.key,
+         self.mg_score, self.eg_score, self.phase, self.pawn_key) = self.undo_stack.pop()
+        self.turn ^= 1
+
+    def repetition_count(self):
+        # Earlier occurrences of this position; only positions since the last
+        # capture or pawn move can repeat, and only with the same side to move.
+        stack = self.undo_stack
+        count = 0
+        for index in range(len(stack) - 2, max(len(stack) - self.halfmove_clock, 0) - 1, -2):
+            if stack[index][5] == self.key:
+                count += 1
+        return count
+
+    def insufficient_material(self):
+        bitboards = self.bitboards
+        if any(bitboards[color << 3 | kind] for color in (WHITE, BLACK) for kind in (PAWN, ROOK, QUEEN)):
+            return False
+        knights = bitboards[KNIGHT] | bitboards[BLACK << 3 | KNIGHT]
+        bishops = bitboards[BISHOP] | bitboards[BLACK << 3 | BISHOP]
+        minors = bin(knights | bishops).count("1")
+        if minors <= 1:
+            return True
+        # Any number of bishops that all stand on one square color cannot mate.
+        return not knights and (not bishops & LIGHT_SQUARES or not bishops & ~LIGHT_SQUARES)
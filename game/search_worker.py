@@ -0,0 +1,79 @@
+import threading
+from game.position import Position
+from game.engine import Engine, SearchResult
+
+class SearchHandle:
+    # Non-blocking view of a search running on a worker thread.
+    def __init__(self, ponder_move=None):
+        self.ponder_move = ponder_move
+        self.stop_event = threading.Event()
+        self.finished = threading.Event()
+        self.search_result: SearchResult = None
+        self.timer = None
+
+    def done(self):
+        return self.finished.is_set()
+
+    def result(self, timeout=None):
+        self.finished.wait(timeout)
+        return self.search_result
+
+    def cancel(self):
+        self.stop_event.set()
+        if self.timer is not None:
+            self.timer.cancel()
+
+    def ponderhit(self, time_limit=None):
+        # The opponent played the expected move: the open-ended ponder search
+        # becomes the real search, stopping once the move budget is spent.
+        self.ponder_move = None
+        if time_limit is None:
+            self.stop_event.set()
+            return
+        self.timer = threading.Timer(time_limit, self.stop_event.set)
+        self.timer.daemon = True
+        self.timer.start()
+
+class SearchWorker:
+    # Runs one engine search at a time on a daemon thread against a private
+    # copy of the position, so the caller's position can keep being drawn.
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.handle: SearchHandle = None
+        self.thread = None
+
+    def busy(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, position: Position, depth=None, nodes=None, time_limit=None):
+        return self._start(position.copy(), SearchHandle(), depth, nodes, time_limit, False)
+
+    def ponder(self, position: Position, ponder_move):
+        # Search the position after the expected reply with no budget; the
+        # handle is either promoted with ponderhit() or cancelled.
+        ponder_position = position.copy()
+        ponder_position.make_move(ponder_move)
+        return self._start(ponder_position, SearchHandle(ponder_move), None, None, None, True)
+
+    def cancel(self):
+        if self.handle is not None:
+            self.handle.cancel()
+        if self.thread is not None:
+            self.thread.join()
+        self.handle = None
+        self.thread = None
+
+    def _start(self, position, handle, depth, nodes, time_limit, infinite):
+        self.cancel()
+        self.handle = handle
+        self.thread = threading.Thread(target=self._run, args=(position, handle, depth, nodes, time_limit, infinite),
+                                       daemon=True)
+        self.thread.start()
+        return handle
+
+    def _run(self, position, handle, depth, nodes, time_limit, infinite):
+        try:
+            self.engine.position = position
+            handle.search_result = self.engine.search(depth, nodes, time_limit, handle.stop_event, infinite=infinite)
+        finally:
+            handle.finished.set()
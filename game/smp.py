@@ -0,0 +1,102 @@
+import multiprocessing
+import queue
+from multiprocessing import shared_memory
+from game.position import Position
+from game.engine import Engine, SearchResult, MAX_DEPTH
+from game.transposition import TranspositionTable, table_bytes
+
+# Seconds between liveness checks while waiting for helper results.
+RESULT_POLL = 0.1
+
+def _helper_main(memory_name, hash_size_mb, index, tasks, results, stop_event):
+    memory = shared_memory.SharedMemory(name=memory_name)
+    table = TranspositionTable(hash_size_mb, buffer=memory.buf)
+    engine = Engine(Position(), None, transposition_table=table)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            fen, depth, age = task
+            engine.position = Position.from_fen(fen)
+            # Engine.search advances the age itself; every process must land on
+            # the same value as the main search.
+            table.age = (age - 1) & 0xFF
+            # Helpers start one or two plies deeper in turn, so the processes
+            # spread over different depths and fill the shared table with
+            # results the others can reuse.
+            result = engine.search(depth=depth, stop_event=stop_event, start_depth=1 + index % 3)
+            results.put((index, result.best_move, result.score, result.depth, result.nodes))
+    finally:
+        table.release()
+        memory.close()
+
+class ParallelSearch:
+    # Lazy SMP: N processes search the same root with one shared transposition
+    # table and no other coordination; the main search decides when to stop.
+    def __init__(self, threads=2, hash_size_mb=16):
+        self.threads = max(1, threads)
+        self.hash_size_mb = hash_size_mb
+        self.memory = shared_memory.SharedMemory(create=True, size=table_bytes(hash_size_mb))
+        self.transposition_table = TranspositionTable(hash_size_mb, buffer=self.memory.buf)
+        self.engine = Engine(Position(), None, transposition_table=self.transposition_table)
+        context = multiprocessing.get_context()
+        self.stop_event = context.Event()
+        self.results = context.Queue()
+        self.tasks = []
+        self.workers = []
+        for index in range(1, self.threads):
+            tasks = context.Queue()
+            worker = context.Process(target=_helper_main, daemon=True,
+                                     args=(self.memory.name, hash_size_mb, index, tasks, self.results, self.stop_event))
+            worker.start()
+            self.tasks.append(tasks)
+            self.workers.append(worker)
+
+    def search(self, position: Position, depth=None, nodes=None, time_limit=None, stop_event=None, infinite=False,
+               on_iteration=None):
+        fen = position.to_fen()
+        helper_depth = depth or MAX_DEPTH
+        self.stop_event.clear()
+        self.engine.position = Position.from_fen(fen)
+        age = (self.transposition_table.age + 1) & 0xFF
+        # Helpers that have died are left out; nothing would answer for them.
+        pending = {index for index, worker in enumerate(self.workers, 1) if worker.is_alive()}
+        for index in pending:
+            self.tasks[index - 1].put((fen, helper_depth, age))
+        main = self.engine.search(depth, nodes, time_limit, stop_event, infinite=infinite, on_iteration=on_iteration)
+        self.stop_event.set()
+
+        # Prefer the deepest completed iteration; the main search wins ties.
+        best = main
+        total_nodes = main.nodes
+        while pending:
+            try:
+                index, best_move, score, result_depth, result_nodes = self.results.get(timeout=RESULT_POLL)
+            except queue.Empty:
+                # A helper that crashed or was killed mid-search never sends
+                # its result; stop waiting for it instead of hanging.
+                pending = {index for index in pending if self.workers[index - 1].is_alive()}
+                continue
+            pending.discard(index)
+            total_nodes += result_nodes
+            if best_move and result_depth > best.depth:
+                best = SearchResult(best_move, score, result_depth)
+        return SearchResult(best.best_move, best.score, best.depth, total_nodes, main.elapsed, best.pv)
+
+    def close(self):
+        for tasks in self.tasks:
+            tasks.put(None)
+        for worker in self.workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        self.transposition_table.release()
+        self.memory.close()
+        self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
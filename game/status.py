@@ -0,0 +1,38 @@
+from game.piece import WHITE
+from game.position import Position
+from game.movegen import legal_moves, in_check
+
+class GameStatus:
+    # Everything callers ask about the side to move, computed once when a
+    # move is made instead of on every query.
+    def __init__(self, position: Position):
+        self.key = position.key
+        self.turn = position.turn
+        self.moves = legal_moves(position)
+        self.moves_by_square = {}
+        for move in self.moves:
+            self.moves_by_square.setdefault(move & 63, []).append(move)
+        self.in_check = in_check(position)
+        self.checkmate = self.in_check and not self.moves
+        self.stalemate = not self.in_check and not self.moves
+        self.fifty_moves = position.halfmove_clock >= 100
+        self.repetition = position.repetition_count() >= 2
+        self.insufficient_material = position.insufficient_material()
+        self.result, self.termination = None, None
+        if self.checkmate:
+            self.result, self.termination = ("0-1" if self.turn == WHITE else "1-0"), "checkmate"
+        elif self.stalemate:
+            self.result, self.termination = "1/2-1/2", "stalemate"
+        elif self.fifty_moves:
+            self.result, self.termination = "1/2-1/2", "fifty moves"
+        elif self.repetition:
+            self.result, self.termination = "1/2-1/2", "repetition"
+        elif self.insufficient_material:
+            self.result, self.termination = "1/2-1/2", "insufficient material"
+
+    @property
+    def over(self):
+        return self.result is not None
+
+    def moves_from(self, sq):
+        return self.moves_by_square.get(sq, [])
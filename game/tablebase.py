@@ -0,0 +1,462 @@
+import argparse
+import mmap
+import os
+import sys
+import time
+from game.piece import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE, BLACK, PIECE_SYMBOLS
+from game.evaluation import PIECE_VALUES
+from game.position import Position
+from game.movegen import legal_moves
+from game.move import NO_SQUARE
+from game.bitboard import KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, BIT, rook_attacks, bishop_attacks
+
+# One byte per position, from the side to move's point of view: 0 is a draw,
+# 255 an illegal or non-canonical index, anything else is the distance to
+# mate in plies plus one. Odd distances are wins and even ones losses, so
+# the byte carries both WDL and DTM. Tables assume no castling rights and
+# no en-passant square, and ignore the fifty-move rule.
+DRAW = 0
+INVALID = 255
+MAX_DISTANCE = 253
+UNKNOWN = 0xFFFF
+
+DEFAULT_TABLES = ["KQvK", "KRvK", "KBvK", "KNvK", "KPvK"]
+SYMBOL_KINDS = {symbol.upper(): kind for kind, symbol in PIECE_SYMBOLS.items()}
+
+def _symmetry(transform):
+    return [transform(sq & 7, sq >> 3) for sq in range(64)]
+
+# The eight board symmetries as square maps; pawn tables may only mirror files.
+SYMMETRIES = [_symmetry(transform) for transform in (
+    lambda col, row: row * 8 + col,
+    lambda col, row: row * 8 + 7 - col,
+    lambda col, row: (7 - row) * 8 + col,
+    lambda col, row: (7 - row) * 8 + 7 - col,
+    lambda col, row: col * 8 + row,
+    lambda col, row: col * 8 + 7 - row,
+    lambda col, row: (7 - col) * 8 + row,
+    lambda col, row: (7 - col) * 8 + 7 - row,
+)]
+
+# The first king is confined to the a1-d1-d4 triangle in pawnless tables and
+# to the a-d files otherwise, which divides the table size by 6.4 or 2.
+TRIANGLE = [sq for sq in range(64) if (sq & 7) <= 3 and 7 - (sq >> 3) <= (sq & 7)]
+HALF_BOARD = [sq for sq in range(64) if (sq & 7) <= 3]
+PAWNLESS_KING_SYMMETRIES = [[index for index, symmetry in enumerate(SYMMETRIES) if symmetry[sq] in TRIANGLE]
+                            for sq in range(64)]
+PAWN_KING_SYMMETRIES = [[0] if (sq & 7) <= 3 else [1] for sq in range(64)]
+
+def _side_key(pieces):
+    return sum(PIECE_VALUES[SYMBOL_KINDS[symbol]] for symbol in pieces), len(pieces), pieces
+
+def normalize_signature(signature):
+    # (canonical signature, flipped): the stronger side always comes first.
+    first, second = signature.upper().split("V")
+    first = "K" + "".join(sorted(first.replace("K", "", 1), key=lambda symbol: -SYMBOL_KINDS[symbol]))
+    second = "K" + "".join(sorted(second.replace("K", "", 1), key=lambda symbol: -SYMBOL_KINDS[symbol]))
+    if _side_key(first[1:]) < _side_key(second[1:]):
+        return f"{second}v{first}", True
+    return f"{first}v{second}", False
+
+def signature_of(pieces):
+    # pieces: (color, kind, sq) triples with white as the first side.
+    sides = ["", ""]
+    for color, kind, _ in pieces:
+        sides[color] += PIECE_SYMBOLS[kind].upper()
+    return f"{sides[WHITE]}v{sides[BLACK]}"
+
+def _attacks(kind, side, sq, occupied):
+    if kind == PAWN:
+        return PAWN_ATTACKS[side][sq]
+    if kind == KNIGHT:
+        return KNIGHT_ATTACKS[sq]
+    if kind == BISHOP:
+        return bishop_attacks(sq, occupied)
+    if kind == ROOK:
+        return rook_attacks(sq, occupied)
+    if kind == QUEEN:
+        return rook_attacks(sq, occupied) | bishop_attacks(sq, occupied)
+    return KING_ATTACKS[sq]
+
+class Table:
+    # Index layout for one material signature. Side 0 is the signature's
+    # first (white) side; slots list its king, its other pieces, then the
+    # same for side 1.
+    def __init__(self, signature):
+        self.signature = signature
+        first, second = signature.split("v")
+        self.slots = [(side, SYMBOL_KINDS[symbol]) for side, pieces in enumerate((first, second)) for symbol in pieces]
+        self.sides = [side for side, _ in self.slots]
+        self.kinds = [kind for _, kind in self.slots]
+        self.king_slots = [self.slots.index((side, KING)) for side in (0, 1)]
+        self.has_pawns = PAWN in self.kinds
+        self.king_squares = HALF_BOARD if self.has_pawns else TRIANGLE
+        self.king_index = {sq: index for index, sq in enumerate(self.king_squares)}
+        self.king_symmetries = PAWN_KING_SYMMETRIES if self.has_pawns else PAWNLESS_KING_SYMMETRIES
+        # Runs of identical pieces are stored with sorted squares.
+        self.groups = []
+        start = 1
+        while start < len(self.slots):
+            end = start
+            while end < len(self.slots) and self.slots[end] == self.slots[start]:
+                end += 1
+            if end - start > 1:
+                self.groups.append((start, end))
+            start = end
+        self.size = 2 * len(self.king_squares) * 64 ** (len(self.slots) - 1)
+
+    def index(self, squares, stm):
+        best = None
+        for symmetry_index in self.king_symmetries[squares[0]]:
+            symmetry = SYMMETRIES[symmetry_index]
+            mapped = [symmetry[sq] for sq in squares]
+            for start, end in self.groups:
+                mapped[start:end] = sorted(mapped[start:end])
+            index = stm * len(self.king_squares) + self.king_index[mapped[0]]
+            for sq in mapped[1:]:
+                index = index * 64 + sq
+            if best is None or index < best:
+                best = index
+        return best
+
+    def decode(self, index):
+        squares = []
+        for _ in range(len(self.slots) - 1):
+            squares.append(index & 63)
+            index >>= 6
+        squares.append(self.king_squares[index % len(self.king_squares)])
+        squares.reverse()
+        return squares, index // len(self.king_squares)
+
+    def attacked(self, squares, sq, by_side, occupied, skip=-1):
+        for slot, piece_sq in enumerate(squares):
+            if slot != skip and self.sides[slot] == by_side and _attacks(self.kinds[slot], by_side, piece_sq, occupied) & BIT[sq]:
+                return True
+        return False
+
+    def is_legal(self, squares, stm):
+        if len(set(squares)) != len(squares):
+            return False
+        for slot, sq in enumerate(squares):
+            if self.kinds[slot] == PAWN and sq >> 3 in (0, 7):
+                return False
+        occupied = 0
+        for sq in squares:
+            occupied |= BIT[sq]
+        return not self.attacked(squares, squares[self.king_slots[stm ^ 1]], stm, occupied)
+
+    def moves(self, squares, stm):
+        # Legal moves as (slot, target, captured slot or -1, promotion kind).
+        occupied = own = 0
+        for slot, sq in enumerate(squares):
+            occupied |= BIT[sq]
+            if self.sides[slot] == stm:
+                own |= BIT[sq]
+        by_square = {sq: slot for slot, sq in enumerate(squares)}
+        moves = []
+        for slot, sq in enumerate(squares):
+            if self.sides[slot] != stm:
+                continue
+            kind = self.kinds[slot]
+            if kind == PAWN:
+                # Side 0 pawns move like white ones, towards row 0.
+                step = -8 if stm == 0 else 8
+                targets = PAWN_ATTACKS[stm][sq] & occupied & ~own
+                if not occupied & BIT[sq + step]:
+                    targets |= BIT[sq + step]
+                    if sq >> 3 == (6 if stm == 0 else 1) and not occupied & BIT[sq + 2 * step]:
+                        targets |= BIT[sq + 2 * step]
+            else:
+                targets = _attacks(kind, stm, sq, occupied) & ~own
+            while targets:
+                low = targets & -targets
+                target = low.bit_length() - 1
+                targets ^= low
+                captured = by_square.get(target, -1)
+                if captured >= 0 and self.kinds[captured] == KING:
+                    continue
+                moved = squares[:]
+                moved[slot] = target
+                after = (occupied ^ BIT[sq]) | BIT[target]
+                king_sq = target if kind == KING else squares[self.king_slots[stm]]
+                if self.attacked(moved, king_sq, stm ^ 1, after, captured):
+                    continue
+                if kind == PAWN and target >> 3 in (0, 7):
+                    for promotion in (QUEEN, ROOK, BISHOP, KNIGHT):
+                        moves.append((slot, target, captured, promotion))
+                else:
+                    moves.append((slot, target, captured, 0))
+        return moves
+
+    def predecessors(self, squares, stm):
+        # Positions one non-capturing, non-promoting move earlier.
+        mover = stm ^ 1
+        occupied = 0
+        for sq in squares:
+            occupied |= BIT[sq]
+        found = set()
+        for slot, sq in enumerate(squares):
+            if self.sides[slot] != mover:
+                continue
+            kind = self.kinds[slot]
+            if kind == PAWN:
+                step = 8 if mover == 0 else -8
+                origins = 0
+                origin = sq + step
+                if 0 < origin >> 3 < 7 and not occupied & BIT[origin]:
+                    origins |= BIT[origin]
+                    if sq >> 3 == (4 if mover == 0 else 3) and not occupied & BIT[origin + step]:
+                        origins |= BIT[origin + step]
+            else:
+                origins = _attacks(kind, mover, sq, occupied) & ~occupied
+            while origins:
+                low = origins & -origins
+                origin = low.bit_length() - 1
+                origins ^= low
+                previous = squares[:]
+                previous[slot] = origin
+                before = (occupied ^ BIT[sq]) | BIT[origin]
+                if not self.attacked(previous, previous[self.king_slots[stm]], mover, before):
+                    found.add(self.index(previous, mover))
+        return found
+
+class Tablebases:
+    def __init__(self, directory):
+        self.directory = directory
+        self.tables = {}
+        self.files = {}
+        self.max_pieces = 2
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.endswith(".tb"):
+                    self.max_pieces = max(self.max_pieces, len(name) - 4)
+
+    def table(self, signature):
+        # (Table, data) for a canonical signature, or None when it is missing.
+        if signature not in self.tables:
+            path = os.path.join(self.directory, signature + ".tb")
+            self.tables[signature] = None
+            if os.path.exists(path):
+                table = Table(signature)
+                handle = open(path, "rb")
+                if os.path.getsize(path) != table.size:
+                    handle.close()
+                    raise ValueError(f"{path} has the wrong size for {signature}")
+                self.files[signature] = handle
+                self.tables[signature] = (table, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ))
+        return self.tables[signature]
+
+    def probe_pieces(self, pieces, stm):
+        # Raw byte for (color, kind, sq) pieces with color stm to move, or
+        # None without a table. Bare kings are always drawn.
+        if len(pieces) == 2:
+            return DRAW
+        signature, flipped = normalize_signature(signature_of(pieces))
+        entry = self.table(signature)
+        if entry is None:
+            return None
+        table, data = entry
+        if flipped:
+            # Swap colours and mirror the ranks, so pawns keep their direction.
+            pieces = [(color ^ 1, kind, sq ^ 56) for color, kind, sq in pieces]
+            stm ^= 1
+        squares = table_squares(table, pieces)
+        return data[table.index(squares, stm)]
+
+    def probe(self, position: Position):
+        # (wdl, plies to mate) for the side to move, or None.
+        if position.castling or position.ep_square != NO_SQUARE:
+            return None
+        occupied = position.occupancy[WHITE] | position.occupancy[BLACK]
+        if occupied.bit_count() > self.max_pieces:
+            return None
+        pieces = [(piece >> 3, piece & 7, sq) for sq, piece in enumerate(position.board) if piece]
+        value = self.probe_pieces(pieces, position.turn)
+        if value is None or value == INVALID:
+            return None
+        if value == DRAW:
+            return 0, 0
+        distance = value - 1
+        return (1 if distance & 1 else -1), distance
+
+    def probe_score(self, position: Position, ply, mate_score):
+        result = self.probe(position)
+        if result is None:
+            return None
+        wdl, distance = result
+        if wdl > 0:
+            return mate_score - ply - distance
+        if wdl < 0:
+            return -mate_score + ply + distance
+        return 0
+
+    def best_move(self, position: Position, mate_score):
+        # (move, score) that keeps the best result by the shortest (or, when
+        # losing, longest) path, or None unless every reply can be probed.
+        best = None
+        for move in legal_moves(position):
+            position.make_move(move)
+            score = self.probe_score(position, 1, mate_score)
+            position.unmake_move()
+            if score is None:
+                return None
+            if best is None or -score > best[1]:
+                best = (move, -score)
+        return best
+
+    def close(self):
+        for entry in self.tables.values():
+            if entry is not None:
+                entry[1].close()
+        for handle in self.files.values():
+            handle.close()
+        self.tables = {}
+        self.files = {}
+
+def table_squares(table: Table, pieces):
+    # Orders (side, kind, sq) pieces into the table's slot order.
+    remaining = sorted(pieces, key=lambda piece: piece[2])
+    squares = []
+    for side, kind in table.slots:
+        for index, (color, piece_kind, sq) in enumerate(remaining):
+            if color == side and piece_kind == kind:
+                squares.append(sq)
+                del remaining[index]
+                break
+    return squares
+
+def child_signatures(signature):
+    # Material reachable by one capture or promotion.
+    first, second = signature.split("v")
+    children = set()
+    for side, pieces in enumerate((first, second)):
+        other = second if side == 0 else first
+        for index, symbol in enumerate(other):
+            if symbol != "K":
+                remaining = other[:index] + other[index + 1:]
+                children.add(normalize_signature(f"{pieces}v{remaining}" if side == 0 else f"{remaining}v{pieces}")[0])
+        if "P" in pieces:
+            for promotion in "QRBN":
+                promoted = pieces.replace("P", promotion, 1)
+                children.add(normalize_signature(f"{promoted}v{other}" if side == 0 else f"{other}v{promoted}")[0])
+    return sorted(child for child in children if child != "KvK")
+
+def generate(signature, directory, out=sys.stdout):
+    # Retrograde analysis: one forward pass counts each position's distinct
+    # successors and resolves moves that change material from the smaller
+    # tables; results are then propagated backwards from the mates in order
+    # of distance, so every win is found at its shortest and every loss at
+    # its longest distance.
+    signature, _ = normalize_signature(signature)
+    path = os.path.join(directory, signature + ".tb")
+    # A table listed explicitly may already have been built as a dependency
+    # of an earlier one.
+    if os.path.exists(path):
+        return path
+    os.makedirs(directory, exist_ok=True)
+    tablebases = Tablebases(directory)
+    for child in child_signatures(signature):
+        if tablebases.table(child) is None:
+            generate(child, directory, out)
+    tablebases = Tablebases(directory)
+    start = time.perf_counter()
+    table = Table(signature)
+    size = table.size
+    results = bytearray([INVALID]) * size
+    remaining = bytearray(size)
+    win_distance = [UNKNOWN] * size
+    loss_distance = [0] * size
+    drawn = bytearray(size)
+    buckets = [[] for _ in range(MAX_DISTANCE + 2)]
+    for index in range(size):
+        squares, stm = table.decode(index)
+        if not table.is_legal(squares, stm) or table.index(squares, stm) != index:
+            continue
+        moves = table.moves(squares, stm)
+        children = set()
+        for slot, target, captured, promotion in moves:
+            moved = squares[:]
+            moved[slot] = target
+            if captured < 0 and not promotion:
+                children.add(table.index(moved, stm ^ 1))
+                continue
+            pieces = [(table.sides[piece_slot], promotion if piece_slot == slot and promotion else table.kinds[piece_slot], sq)
+                      for piece_slot, sq in enumerate(moved) if piece_slot != captured]
+            value = tablebases.probe_pieces(pieces, stm ^ 1)
+            if value is None or value == INVALID:
+                raise ValueError(f"Missing or invalid entry in child table of {signature}")
+            if value == DRAW:
+                drawn[index] = 1
+            elif (value - 1) & 1:
+                loss_distance[index] = max(loss_distance[index], value)
+            else:
+                win_distance[index] = min(win_distance[index], value)
+        remaining[index] = len(children)
+        results[index] = DRAW
+        if not moves:
+            if table.attacked(squares, squares[table.king_slots[stm]], stm ^ 1, sum(BIT[sq] for sq in squares)):
+                buckets[0].append(index)
+        elif win_distance[index] != UNKNOWN:
+            buckets[win_distance[index]].append(index)
+        elif not children and not drawn[index]:
+            buckets[loss_distance[index]].append(index)
+    resolved = bytearray(size)
+    wins = losses = 0
+    for distance in range(MAX_DISTANCE + 1):
+        for index in buckets[distance]:
+            if resolved[index]:
+                continue
+            resolved[index] = 1
+            results[index] = distance + 1
+            squares, stm = table.decode(index)
+            if distance & 1:
+                wins += 1
+                for previous in table.predecessors(squares, stm):
+                    if resolved[previous] or results[previous] == INVALID:
+                        continue
+                    remaining[previous] -= 1
+                    loss_distance[previous] = max(loss_distance[previous], distance + 1)
+                    if not remaining[previous] and win_distance[previous] == UNKNOWN and not drawn[previous]:
+                        buckets[loss_distance[previous]].append(previous)
+            else:
+                losses += 1
+                for previous in table.predecessors(squares, stm):
+                    if not resolved[previous] and distance + 1 < win_distance[previous]:
+                        win_distance[previous] = distance + 1
+                        buckets[distance + 1].append(previous)
+    if buckets[MAX_DISTANCE + 1]:
+        raise ValueError(f"{signature} has mates beyond {MAX_DISTANCE} plies")
+    with open(path, "wb") as handle:
+        handle.write(results)
+    tablebases.close()
+    legal = size - results.count(INVALID)
+    longest = max((distance for distance in range(MAX_DISTANCE + 1) if buckets[distance]), default=0)
+    print(f"{signature}: {legal} positions, {wins} wins, {losses} losses, {legal - wins - losses} draws, "
+          f"longest mate {longest} plies, {time.perf_counter() - start:.1f}s", file=out)
+    return path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate and probe endgame tablebases.")
+    parser.add_argument("--dir", default="tablebases")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    generate_parser = subparsers.add_parser("generate", help="build tables (and the smaller ones they need)")
+    generate_parser.add_argument("signatures", nargs="*", default=DEFAULT_TABLES, help="e.g. KQvK KRvK KPvK KQvKR")
+    probe_parser = subparsers.add_parser("probe", help="look up a position")
+    probe_parser.add_argument("fen")
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        for signature in args.signatures:
+            generate(signature, args.dir)
+        return 0
+    tablebases = Tablebases(args.dir)
+    result = tablebases.probe(Position.from_fen(args.fen))
+    if result is None:
+        print("not in tablebases")
+        return 1
+    wdl, distance = result
+    print({1: f"win, mate in {distance} plies", 0: "draw", -1: f"loss, mated in {distance} plies"}[wdl])
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
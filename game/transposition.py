@@ -0,0 +1,148 @@
+from array import array
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+ENTRY_WORDS = 2
+ENTRY_BYTES = 8 * ENTRY_WORDS
+BUCKET_SIZE = 2
+
+# The data word packs move (17 bits), score (20 bits, offset), depth (8 bits),
+# bound (2 bits) and age (8 bits). The key word stores key ^ data so a torn or
+# colliding entry fails verification instead of returning foreign data.
+MOVE_BITS = 17
+SCORE_SHIFT = MOVE_BITS
+SCORE_BITS = 20
+SCORE_OFFSET = 1 << (SCORE_BITS - 1)
+DEPTH_SHIFT = SCORE_SHIFT + SCORE_BITS
+BOUND_SHIFT = DEPTH_SHIFT + 8
+AGE_SHIFT = BOUND_SHIFT + 2
+MOVE_MASK = (1 << MOVE_BITS) - 1
+SCORE_MASK = (1 << SCORE_BITS) - 1
+
+def table_bytes(size_mb):
+    # Bucket count is rounded down to a power of two so indexing is a mask.
+    buckets = max(1, (size_mb * 1024 * 1024) // (ENTRY_BYTES * BUCKET_SIZE))
+    return (1 << (buckets.bit_length() - 1)) * BUCKET_SIZE * ENTRY_BYTES
+
+class TranspositionTable:
+    def __init__(self, size_mb=16, buffer=None):
+        # With a buffer (e.g. multiprocessing.shared_memory) the entries live
+        # in that memory, letting several processes share one table.
+        self.size_mb = size_mb
+        self.age = 0
+        self.buffer = buffer
+        self.entries = None
+        self.bucket_mask = 0
+        self.resize(size_mb)
+
+    def resize(self, size_mb):
+        size = table_bytes(size_mb)
+        if self.buffer is not None:
+            if len(self.buffer) < size:
+                raise ValueError(f"Buffer of {len(self.buffer)} bytes is too small for a {size_mb} MB table")
+            self.entries = memoryview(self.buffer)[:size].cast("Q")
+        else:
+            self.entries = array("Q", bytes(size))
+        self.size_mb = size_mb
+        self.bucket_mask = size // (BUCKET_SIZE * ENTRY_BYTES) - 1
+        self.reset_stats()
+
+    def clear(self):
+        # Zeroes the entries in place: no new table is allocated, and a view
+        # into shared memory stays valid.
+        memoryview(self.entries).cast("B")[:] = bytes(len(self.entries) * 8)
+        self.age = 0
+        self.reset_stats()
+
+    def release(self):
+        # Drop the view so a shared memory block can be closed.
+        if self.buffer is not None:
+            self.entries.release()
+            self.entries = None
+            self.buffer = None
+
+    def reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.collisions = 0
+        self.stores = 0
+        self.replacements = 0
+
+    def new_search(self):
+        self.age = (self.age + 1) & 0xFF
+
+    @property
+    def capacity(self):
+        return len(self.entries) // ENTRY_WORDS
+
+    def probe(self, key):
+        # Returns (depth, score, bound, move) or None.
+        self.probes += 1
+        entries = self.entries
+        index = (key & self.bucket_mask) * BUCKET_SIZE * ENTRY_WORDS
+        occupied = False
+        for slot in range(index, index + BUCKET_SIZE * ENTRY_WORDS, ENTRY_WORDS):
+            data = entries[slot + 1]
+            if not data:
+                continue
+            if entries[slot] ^ data == key:
+                self.hits += 1
+                return ((data >> DEPTH_SHIFT) & 0xFF, ((data >> SCORE_SHIFT) & SCORE_MASK) - SCORE_OFFSET,
+                        (data >> BOUND_SHIFT) & 3, data & MOVE_MASK)
+            occupied = True
+        if occupied:
+            self.collisions += 1
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        # Slot 0 is depth-preferred (kept unless the new entry is at least as
+        # deep, the same position, or left over from an older search); slot 1
+        # is always-replace.
+        self.stores += 1
+        entries = self.entries
+        index = (key & self.bucket_mask) * BUCKET_SIZE * ENTRY_WORDS
+        score = min(max(int(score), 1 - SCORE_OFFSET), SCORE_OFFSET - 1)
+        data = ((move & MOVE_MASK) | ((score + SCORE_OFFSET) << SCORE_SHIFT) | ((min(max(depth, 0), 0xFF)) << DEPTH_SHIFT)
+                | (bound << BOUND_SHIFT) | (self.age << AGE_SHIFT))
+        preferred = entries[index + 1]
+        slot = index + ENTRY_WORDS
+        if (not preferred or entries[index] ^ preferred == key
+                or depth >= (preferred >> DEPTH_SHIFT) & 0xFF
+                or (preferred >> AGE_SHIFT) & 0xFF != self.age):
+            slot = index
+        previous = entries[slot + 1]
+        if previous:
+            if entries[slot] ^ previous != key:
+                self.replacements += 1
+            elif not move:
+                # Keep the best move found by an earlier search of this position.
+                data |= previous & MOVE_MASK
+        entries[slot] = key ^ data
+        entries[slot + 1] = data
+
+    def fill_rate(self, sample=1000):
+        # Share of sampled entries written during the current search, as
+        # UCI's hashfull reports it.
+        entries = self.entries
+        sample = min(sample, self.capacity)
+        used = 0
+        for slot in range(0, sample * ENTRY_WORDS, ENTRY_WORDS):
+            data = entries[slot + 1]
+            if data and (data >> AGE_SHIFT) & 0xFF == self.age:
+                used += 1
+        return used / sample if sample else 0.0
+
+    def stats(self):
+        return {
+            "size_mb": self.size_mb,
+            "entries": self.capacity,
+            "probes": self.probes,
+            "hits": self.hits,
+            "collisions": self.collisions,
+            "stores": self.stores,
+            "replacements": self.replacements,
+            "hit_rate": self.hits / self.probes if self.probes else 0.0,
+            "fill_rate": self.fill_rate(),
+        }
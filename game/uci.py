@@ -0,0 +1,296 @@
+import sys
+import threading
+from game.position import Position, STARTING_FEN
+from game.engine import Engine, MATE_SCORE, MAX_PLY
+from game.smp import ParallelSearch
+from game.book import OpeningBook
+from game.tablebase import Tablebases
+from game.movegen import legal_moves, move_from_uci
+from game.move import NO_MOVE, move_to_uci
+from game.piece import WHITE
+
+ENGINE_NAME = "PyChess"
+ENGINE_AUTHOR = "PyChess developers"
+MOVE_OVERHEAD = 0.05
+
+def format_score(score):
+    if score >= MATE_SCORE - MAX_PLY:
+        return f"mate {(MATE_SCORE - score + 1) // 2}"
+    if score <= -MATE_SCORE + MAX_PLY:
+        return f"mate -{(MATE_SCORE + score) // 2}"
+    return f"cp {score}"
+
+def allocate_time(limits, turn):
+    # Seconds to spend on this move from the go parameters, or None.
+    if "movetime" in limits:
+        return max(0.01, limits["movetime"] / 1000 - MOVE_OVERHEAD)
+    remaining = limits.get("wtime" if turn == WHITE else "btime")
+    if remaining is None:
+        return None
+    increment = limits.get("winc" if turn == WHITE else "binc", 0)
+    moves_to_go = limits.get("movestogo", 30)
+    budget = remaining / max(moves_to_go, 1) + increment * 0.8
+    return max(0.01, min(budget, remaining / 2) / 1000 - MOVE_OVERHEAD)
+
+class UCIEngine:
+    def __init__(self, out=sys.stdout):
+        self.out = out
+        self.output_lock = threading.Lock()
+        self.position = Position.from_fen(STARTING_FEN)
+        self.hash_size_mb = 16
+        self.threads = 1
+        self.book: OpeningBook = None
+        self.tablebases: Tablebases = None
+        self.engine = Engine(self.position, None, hash_size_mb=self.hash_size_mb)
+        self.parallel: ParallelSearch = None
+        self.search_thread = None
+        self.stop_event = threading.Event()
+        self.release_event = threading.Event()
+        self.ponder_time = None
+        self.ponder_timer = None
+
+    def send(self, line):
+        with self.output_lock:
+            print(line, file=self.out, flush=True)
+
+    def handle(self, line):
+        # Returns False once the GUI asks the engine to quit.
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        try:
+            return self.dispatch(command, args)
+        except (ValueError, OSError) as error:
+            # A bad FEN, move or option value leaves the previous state in
+            # place; the GUI is told why instead of the engine exiting.
+            self.send(f"info string {command} failed: {error}")
+            return True
+
+    def dispatch(self, command, args):
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send("option name Hash type spin default 16 min 1 max 4096")
+            self.send("option name Threads type spin default 1 min 1 max 256")
+            self.send("option name Ponder type check default false")
+            self.send("option name BookFile type string default <empty>")
+            self.send("option name TablebasePath type string default <empty>")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "ucinewgame":
+            self.wait_for_search()
+            self.cancel_ponder_timer()
+            self.engine.transposition_table.clear()
+        elif command == "setoption":
+            self.wait_for_search()
+            self.set_option(args)
+        elif command == "position":
+            self.wait_for_search()
+            self.set_position(args)
+        elif command == "go":
+            self.wait_for_search()
+            self.go(args)
+        elif command == "stop":
+            self.stop_event.set()
+            self.release_event.set()
+            self.wait_for_search()
+            self.cancel_ponder_timer()
+        elif command == "ponderhit":
+            self.ponderhit()
+        elif command == "quit":
+            return False
+        return True
+
+    def shutdown(self):
+        # Safe to call more than once; main always calls it on exit so the
+        # shared-memory table of an SMP search is released.
+        self.stop_event.set()
+        self.release_event.set()
+        self.wait_for_search()
+        self.close()
+        if self.book is not None:
+            self.book.close()
+            self.book = None
+        if self.tablebases is not None:
+            self.tablebases.close()
+            self.tablebases = None
+
+    def set_option(self, args):
+        text = " ".join(args)
+        if " value " not in text:
+            return
+        name, value = text[len("name "):].split(" value ", 1)
+        name = name.strip().lower()
+        if name == "hash":
+            self.hash_size_mb = max(1, int(value))
+            self.rebuild()
+        elif name == "threads":
+            self.threads = max(1, int(value))
+            self.rebuild()
+        elif name == "bookfile":
+            if self.book is not None:
+                self.book.close()
+            value = value.strip()
+            self.book = OpeningBook(value) if value and value != "<empty>" else None
+            self.engine.book = self.book
+        elif name == "tablebasepath":
+            if self.tablebases is not None:
+                self.tablebases.close()
+            value = value.strip()
+            self.tablebases = Tablebases(value) if value and value != "<empty>" else None
+            self.engine.tablebases = self.tablebases
+
+    def rebuild(self):
+        self.close()
+        if self.threads > 1:
+            self.parallel = ParallelSearch(self.threads, self.hash_size_mb)
+            self.engine = self.parallel.engine
+        else:
+            self.engine = Engine(self.position, None, hash_size_mb=self.hash_size_mb)
+        self.engine.book = self.book
+        self.engine.tablebases = self.tablebases
+
+    def close(self):
+        if self.parallel is not None:
+            self.parallel.close()
+            self.parallel = None
+
+    def set_position(self, args):
+        if args and args[0] == "startpos":
+            position = Position.from_fen(STARTING_FEN)
+            rest = args[1:]
+        elif args and args[0] == "fen":
+            fen_fields = []
+            rest = args[1:]
+            while rest and rest[0] != "moves":
+                fen_fields.append(rest.pop(0))
+            position = Position.from_fen(" ".join(fen_fields))
+        else:
+            return
+        if rest and rest[0] == "moves":
+            for uci in rest[1:]:
+                position.make_move(move_from_uci(position, uci))
+        self.position = position
+
+    def go(self, args):
+        limits = {}
+        flags = set()
+        index = 0
+        while index < len(args):
+            token = args[index]
+            if token in ("infinite", "ponder"):
+                flags.add(token)
+                index += 1
+            elif index + 1 < len(args):
+                try:
+                    limits[token] = int(args[index + 1])
+                except ValueError:
+                    pass
+                index += 2
+            else:
+                index += 1
+        time_limit = allocate_time(limits, self.position.turn)
+        pondering = "ponder" in flags
+        infinite = "infinite" in flags or pondering
+        self.ponder_time = time_limit if pondering else None
+        # A timer left from the previous search must not stop this one.
+        self.cancel_ponder_timer()
+        self.stop_event.clear()
+        self.release_event.clear()
+        if not infinite:
+            self.release_event.set()
+        self.search_thread = threading.Thread(target=self.run_search, daemon=True, args=(
+            limits.get("depth"), limits.get("nodes"), None if infinite else time_limit, infinite))
+        self.search_thread.start()
+
+    def ponderhit(self):
+        # The ponder search keeps running on the real clock from here on. The
+        # timer exists before the search is released, so a search ending in
+        # between still finds (and cancels) it.
+        if self.ponder_time is not None:
+            self.cancel_ponder_timer()
+            self.ponder_timer = threading.Timer(self.ponder_time, self.stop_event.set)
+            self.ponder_timer.daemon = True
+            self.ponder_timer.start()
+        else:
+            self.stop_event.set()
+        self.release_event.set()
+
+    def cancel_ponder_timer(self):
+        timer, self.ponder_timer = self.ponder_timer, None
+        if timer is not None:
+            timer.cancel()
+
+    def run_search(self, depth, nodes, time_limit, infinite):
+        position = self.position.copy()
+        best_move, pv = NO_MOVE, []
+        try:
+            if self.parallel is not None:
+                result = self.parallel.search(position, depth, nodes, time_limit, self.stop_event,
+                                              infinite=infinite, on_iteration=self.report)
+            else:
+                self.engine.position = position
+                result = self.engine.search(depth, nodes, time_limit, self.stop_event, infinite=infinite,
+                                            on_iteration=self.report)
+            best_move, pv = result.best_move, result.pv
+        except Exception as error:
+            # The GUI still gets a bestmove, or it would wait forever. The
+            # failed search may have left moves made on its position.
+            self.send(f"info string search failed: {type(error).__name__}: {error}")
+            position = self.position.copy()
+        # UCI forbids answering an infinite or ponder search before stop/ponderhit.
+        self.release_event.wait()
+        self.cancel_ponder_timer()
+        if not best_move:
+            moves = legal_moves(position)
+            best_move = moves[0] if moves else NO_MOVE
+        if len(pv) > 1 and pv[0] == best_move:
+            ponder_move = pv[1]
+        else:
+            ponder_move = self.expected_reply(position, best_move)
+        if ponder_move:
+            self.send(f"bestmove {move_to_uci(best_move)} ponder {move_to_uci(ponder_move)}")
+        else:
+            self.send(f"bestmove {move_to_uci(best_move)}")
+
+    def expected_reply(self, position, best_move):
+        if not best_move:
+            return NO_MOVE
+        position.make_move(best_move)
+        entry = self.engine.transposition_table.probe(position.key)
+        reply = entry[3] if entry is not None else NO_MOVE
+        if reply and reply not in legal_moves(position):
+            reply = NO_MOVE
+        position.unmake_move()
+        return reply
+
+    def report(self, result):
+        hashfull = int(self.engine.transposition_table.fill_rate() * 1000)
+        self.send(f"info depth {result.depth} score {format_score(result.score)} nodes {result.nodes} "
+                  f"nps {result.nps} time {int(result.elapsed * 1000)} hashfull {hashfull} "
+                  f"pv {' '.join(move_to_uci(move) for move in result.pv)}")
+
+    def wait_for_search(self):
+        if self.search_thread is not None and self.search_thread.is_alive():
+            if self.stop_event.is_set() or self.release_event.is_set():
+                self.search_thread.join()
+            else:
+                # A new command arrived mid-search without stop; finish it first.
+                self.stop_event.set()
+                self.release_event.set()
+                self.search_thread.join()
+        self.search_thread = None
+
+def main():
+    uci = UCIEngine()
+    try:
+        for line in sys.stdin:
+            if not uci.handle(line.strip()):
+                break
+    finally:
+        uci.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+import pytest
+from game.analysis import analyse, format_epd
+
+@pytest.mark.parametrize("fen, terminal, score", [
+    ("7k/6Q1/6K1/8/8/8/8/8 b - - 0 1", "checkmate", -100000),
+    ("7k/8/6QK/8/8/8/8/8 b - - 0 1", "stalemate", 0),
+])
+def test_position_without_moves_records_the_result(fen, terminal, score):
+    result = dict(analyse(fen, depth=2), operations='id "end";')
+    assert (result["terminal"], result["score"]) == (terminal, score)
+    assert format_epd(result) == f'{" ".join(fen.split()[:4])} id "end"; ce {score}; c0 "{terminal}";'
+
+def test_searched_position_records_best_move():
+    result = dict(analyse("7k/8/6QK/8/8/8/8/8 w - - 0 1", depth=2), operations="")
+    assert result["best_move"] == "g6e8"
+    assert format_epd(result).startswith("7k/8/6QK/8/8/8/8/8 w - - bm Qe8#; ce ")
+
+def test_invalid_fen_becomes_an_error_record():
+    result = dict(analyse("not a fen", depth=1), operations="")
+    assert "error" in result
+    assert format_epd(result).endswith(f'c9 "{result["error"]}";')
@@ -0,0 +1,27 @@
+import random
+import pytest
+from game.position import Position
+from game.movegen import legal_moves
+from game.engine import Engine
+
+np = pytest.importorskip("numpy")
+from game.batch_eval import encode_planes, evaluate_batch, evaluate_positions
+
+def test_batch_matches_engine_evaluation():
+    rng = random.Random(16)
+    positions = []
+    for _ in range(40):
+        position = Position.from_fen()
+        for _ in range(rng.randrange(1, 120)):
+            moves = legal_moves(position)
+            if not moves:
+                break
+            position.make_move(rng.choice(moves))
+            positions.append(position.copy())
+    engine = Engine(positions[0], None, hash_size_mb=1)
+    expected = []
+    for position in positions:
+        engine.position = position
+        expected.append(engine.evaluate_board())
+    assert list(evaluate_positions(positions)) == expected
+    assert list(evaluate_batch(encode_planes(positions))) == expected
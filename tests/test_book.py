@@ -0,0 +1,52 @@
+import pytest
+from game.position import Position, STARTING_FEN
+from game.movegen import move_from_uci
+from game.move import move_to_uci
+from game.book import OpeningBook, write_book, encode_book_move
+from utils.polyglot import polyglot_key
+
+# Key test vectors from the Polyglot book format description.
+POLYGLOT_KEYS = [
+    ([], 0x463B96181691FC9C),
+    (["e2e4"], 0x823C9B50FD114196),
+    (["e2e4", "d7d5"], 0x0756B94461C50FB0),
+    (["e2e4", "d7d5", "e4e5"], 0x662FAFB965DB29D4),
+    (["e2e4", "d7d5", "e4e5", "f7f5"], 0x22A48B5A8E47FF78),
+    (["e2e4", "d7d5", "e4e5", "f7f5", "e1e2"], 0x652A607CA3F242C1),
+    (["e2e4", "d7d5", "e4e5", "f7f5", "e1e2", "e8f7"], 0x00FDD303C946BDD9),
+    (["a2a4", "b7b5", "h2h4", "b5b4", "c2c4"], 0x3C8123EA7B067637),
+    (["a2a4", "b7b5", "h2h4", "b5b4", "c2c4", "b4c3", "a1a3"], 0x5C3F9B829B279560),
+]
+
+def play(moves, fen=STARTING_FEN):
+    position = Position.from_fen(fen)
+    for uci in moves:
+        position.make_move(move_from_uci(position, uci))
+    return position
+
+@pytest.mark.parametrize("moves, key", POLYGLOT_KEYS)
+def test_polyglot_key(moves, key):
+    assert polyglot_key(play(moves)) == key
+    # A position set up from FEN hashes the same as one reached by moves.
+    assert polyglot_key(Position.from_fen(play(moves).to_fen())) == key
+
+def test_castling_is_stored_as_king_takes_rook():
+    position = Position.from_fen("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+    # Polyglot squares count from a1: e1 = 4, h1 = 7, a1 = 0.
+    assert encode_book_move(move_from_uci(position, "e1g1")) == 7 | (4 << 6)
+    assert encode_book_move(move_from_uci(position, "e1c1")) == 0 | (4 << 6)
+
+def test_book_round_trip(tmp_path):
+    path = tmp_path / "book.bin"
+    start = play([])
+    castle = Position.from_fen("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+    entries = [
+        (polyglot_key(start), move_from_uci(start, "e2e4"), 3),
+        (polyglot_key(start), move_from_uci(start, "d2d4"), 1),
+        (polyglot_key(castle), move_from_uci(castle, "e1c1"), 1),
+    ]
+    assert write_book(path, entries) == 3
+    with OpeningBook(path) as book:
+        assert [(move_to_uci(move), weight) for move, weight in book.moves(start)] == [("e2e4", 3), ("d2d4", 1)]
+        assert move_to_uci(book.choose(castle)) == "e1c1"
+        assert book.moves(play(["e2e4"])) == []
@@ -0,0 +1,12 @@
+import pytest
+from game.position import Position
+from game.perft import PERFT_SUITE, perft
+
+# Reference counts small enough to keep the suite to a few seconds.
+MAX_NODES = 100000
+CASES = [(name, fen, depth, nodes) for name, fen, counts in PERFT_SUITE
+         for depth, nodes in sorted(counts.items()) if nodes <= MAX_NODES]
+
+@pytest.mark.parametrize("name, fen, depth, nodes", CASES, ids=[f"{case[0]}-{case[2]}" for case in CASES])
+def test_perft(name, fen, depth, nodes):
+    assert perft(Position.from_fen(fen), depth) == nodes
@@ -0,0 +1,58 @@
+import random
+import pytest
+from game.position import Position, STARTING_FEN
+from game.movegen import legal_moves
+from game.evaluation import eval_terms, evaluate, evaluate_reference
+from utils.zobrist import compute_key, compute_pawn_key
+
+PLAYOUT_FENS = [
+    STARTING_FEN,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+    "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+]
+
+def assert_incremental_state(position):
+    assert position.key == compute_key(position)
+    assert position.pawn_key == compute_pawn_key(position)
+    assert (position.mg_score, position.eg_score, position.phase) == eval_terms(position.board)
+    assert evaluate(position) == evaluate_reference(position)
+
+@pytest.mark.parametrize("fen", PLAYOUT_FENS)
+def test_incremental_state_matches_recompute(fen):
+    rng = random.Random(fen)
+    for _ in range(10):
+        position = Position.from_fen(fen)
+        for _ in range(80):
+            moves = legal_moves(position)
+            if not moves:
+                break
+            position.make_move(rng.choice(moves))
+            assert_incremental_state(position)
+        while position.undo_stack:
+            position.unmake_move()
+            assert_incremental_state(position)
+        assert position.to_fen() == Position.from_fen(fen).to_fen()
+
+def test_null_move_round_trip():
+    position = Position.from_fen("rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3")
+    fen, key = position.to_fen(), position.key
+    position.make_null_move()
+    assert position.key == compute_key(position)
+    position.unmake_null_move()
+    assert (position.to_fen(), position.key) == (fen, key)
+
+@pytest.mark.parametrize("fen", [
+    "8/8/8/8/8/8/8/8 w - - 0 1",
+    "4k3/8/8/8/8/8/8/4K3 x - - 0 1",
+    "4k3/8/8/8/8/8/8/4K3 w - e9 0 1",
+    "4k3/8/8/8/8/8/8/4K3 w K - 0 1",
+    "4k3/8/8/8/8/8/4R3/4K3 w - - 0 1",
+    "4k2P/8/8/8/8/8/8/4K3 w - - 0 1",
+    "4k3/ppppppppp/8/8/8/8/8/4K3 w - - 0 1",
+])
+def test_invalid_fen_is_rejected(fen):
+    with pytest.raises(ValueError):
+        Position.from_fen(fen)
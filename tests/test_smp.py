@@ -0,0 +1,11 @@
+from game.position import Position
+from game.smp import ParallelSearch
+
+def test_search_survives_a_dead_helper():
+    with ParallelSearch(threads=3, hash_size_mb=1) as parallel:
+        parallel.workers[0].terminate()
+        parallel.workers[0].join()
+        result = parallel.search(Position.from_fen(), depth=3)
+        assert result.best_move
+        # The next search no longer counts on the dead helper either.
+        assert parallel.search(Position.from_fen(), depth=2).best_move
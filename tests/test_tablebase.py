@@ -0,0 +1,57 @@
+import io
+import random
+import pytest
+from game.position import Position
+from game.movegen import legal_moves, in_check
+from game.tablebase import Tablebases, generate
+
+@pytest.fixture(scope="module")
+def tablebases(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("tablebases")
+    generate("KRvK", str(directory), out=io.StringIO())
+    tables = Tablebases(str(directory))
+    yield tables
+    tables.close()
+
+def random_position(rng):
+    while True:
+        squares = rng.sample(range(64), 3)
+        board = [""] * 64
+        for sq, symbol in zip(squares, "KRk"):
+            board[sq] = symbol
+        rows = []
+        for row in range(8):
+            text, empty = "", 0
+            for symbol in board[row * 8:row * 8 + 8]:
+                if not symbol:
+                    empty += 1
+                    continue
+                text += (str(empty) if empty else "") + symbol
+                empty = 0
+            rows.append(text + (str(empty) if empty else ""))
+        try:
+            return Position.from_fen("/".join(rows) + rng.choice((" w", " b")) + " - - 0 1")
+        except ValueError:
+            continue
+
+def test_probe_agrees_with_move_generation(tablebases):
+    # Every entry must be the best outcome over the entries of its children,
+    # with mates and stalemates taken from move generation.
+    rng = random.Random(19)
+    for _ in range(300):
+        position = random_position(rng)
+        moves = legal_moves(position)
+        if not moves:
+            expected = (-1, 0) if in_check(position) else (0, 0)
+        else:
+            best = None
+            for move in moves:
+                position.make_move(move)
+                wdl, distance = tablebases.probe(position)
+                position.unmake_move()
+                value = (-wdl, distance + 1 if wdl else 0)
+                rank = (value[0], -value[1] if value[0] > 0 else value[1])
+                if best is None or rank > best[0]:
+                    best = (rank, value)
+            expected = best[1]
+        assert tablebases.probe(position) == expected, position.to_fen()
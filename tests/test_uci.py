@@ -0,0 +1,40 @@
+import io
+from game.uci import UCIEngine
+
+def run(uci, *lines):
+    for line in lines:
+        uci.handle(line)
+    uci.wait_for_search()
+    return uci.out.getvalue().splitlines()
+
+def test_failed_search_still_answers_bestmove(monkeypatch):
+    uci = UCIEngine(out=io.StringIO())
+    def fail(*args, **kwargs):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(uci.engine, "search", fail)
+    try:
+        output = run(uci, "position startpos moves e2e4", "go depth 2")
+    finally:
+        uci.shutdown()
+    assert "info string search failed: RuntimeError: boom" in output
+    assert output[-1].startswith("bestmove ") and output[-1] != "bestmove 0000"
+
+def test_failed_search_without_moves_answers_null_move(monkeypatch):
+    uci = UCIEngine(out=io.StringIO())
+    monkeypatch.setattr(uci.engine, "search", lambda *args, **kwargs: 1 / 0)
+    try:
+        output = run(uci, "position fen 7k/6Q1/6K1/8/8/8/8/8 b - - 0 1", "go depth 2")
+    finally:
+        uci.shutdown()
+    assert output[-1] == "bestmove 0000"
+
+def test_threads_option_switches_between_engines():
+    uci = UCIEngine(out=io.StringIO())
+    try:
+        run(uci, "setoption name Threads value 2")
+        assert uci.parallel is not None and uci.engine is uci.parallel.engine
+        run(uci, "setoption name Threads value 1")
+        assert uci.parallel is None and uci.engine.transposition_table.size_mb == 16
+        assert run(uci, "position startpos", "go depth 1")[-1].startswith("bestmove ")
+    finally:
+        uci.shutdown()
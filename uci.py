@@ -0,0 +1,4 @@
+from game.uci import main
+
+if __name__ == "__main__":
+    main()
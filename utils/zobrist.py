@@ -1,32 +1,47 @@
 import random
-from collections import defaultdict
-from game.piece import PieceType, PieceColor
 
-class Zobrist:
-    def __init__(self, board):
-        self.board = board
-        self.hash_table = defaultdict(int)
-        self.zobrist_keys = {}
-        self.generate_zobrist_keys()
+# Keys come from a fixed seed so that every process, host and on-disk cache
+# (transposition tables, books, repetition history) agrees on a position's key.
+ZOBRIST_SEED = 0x9E3779B97F4A7C15
 
-    def generate_zobrist_keys(self):
-        for col in range(8):
-            for row in range(8):
-                for piece in PieceType:
-                    for color in PieceColor:
-                        self.zobrist_keys[(col, row, piece, color)] = random.getrandbits(64)
+def generate_zobrist_keys(seed=ZOBRIST_SEED):
+    generator = random.Random(seed)
+    # Indexed by piece code then square; the empty code keeps a zero row.
+    piece_keys = [[0] * 64 for _ in range(15)]
+    for piece in range(15):
+        if piece & 7 == 0 or piece & 7 == 7:
+            continue
+        for sq in range(64):
+            piece_keys[piece][sq] = generator.getrandbits(64)
+    side_key = generator.getrandbits(64)
+    right_keys = [generator.getrandbits(64) for _ in range(4)]
+    castling_keys = [0] * 16
+    for rights in range(16):
+        for bit in range(4):
+            if rights & (1 << bit):
+                castling_keys[rights] ^= right_keys[bit]
+    ep_file_keys = [generator.getrandbits(64) for _ in range(8)]
+    return piece_keys, side_key, castling_keys, ep_file_keys
 
-    def compute_hash(self):
-        hash_value = 0
-        for (coord, piece) in self.board.representation.items():
-            col, row = coord
-            if piece:
-                hash_value ^= self.zobrist_keys[(col, row, piece.name, piece.color)]
-        return hash_value
+PIECE_KEYS, SIDE_KEY, CASTLING_KEYS, EP_FILE_KEYS = generate_zobrist_keys()
 
-    def update_history(self, current_hash):
-        self.hash_table[current_hash] += 1
-        return self.hash_table[current_hash]
+def compute_key(position):
+    key = 0
+    for sq, piece in enumerate(position.board):
+        if piece:
+            key ^= PIECE_KEYS[piece][sq]
+    if position.turn:
+        key ^= SIDE_KEY
+    key ^= CASTLING_KEYS[position.castling]
+    if position.ep_square >= 0:
+        key ^= EP_FILE_KEYS[position.ep_square & 7]
+    return key
 
-    def reset_history(self):
-        self.hash_table.clear()
\ No newline at end of file
+def compute_pawn_key(position):
+    # Pawns and kings only: the pawn hash caches structure and king shelter,
+    # which depend on nothing else.
+    key = 0
+    for sq, piece in enumerate(position.board):
+        if piece & 7 in (1, 6):
+            key ^= PIECE_KEYS[piece][sq]
+    return key